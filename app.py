@@ -4,6 +4,8 @@ from datetime import datetime, timedelta
 import time
 import requests
 import json
+import html
+import math
 import plotly.express as px
 import plotly.graph_objects as go
 
@@ -21,6 +23,7 @@ st.write("Cloud version with Supabase database")
 
 # Use cloud database utilities (REST API based)
 import cloud_db_utils as db_utils
+import local_cache
 
 # Session state management
 if "current_store" not in st.session_state:
@@ -31,10 +34,29 @@ if "show_expense_form" not in st.session_state:
     st.session_state.show_expense_form = False
 if "edit_expense_id" not in st.session_state:
     st.session_state.edit_expense_id = None
+if "expense_page" not in st.session_state:
+    st.session_state.expense_page = 0
+if "active_sync_jobs" not in st.session_state:
+    st.session_state.active_sync_jobs = {}
+
+# Expense table sort options, applied by the database
+EXPENSE_SORT_OPTIONS = {
+    "Newest first": "date.desc",
+    "Oldest first": "date.asc",
+    "Largest amount": "amount.desc",
+    "Smallest amount": "amount.asc",
+    "Category": "category.asc"
+}
+
+# Sync jobs run in sync_worker.py; the sidebar polls their status while any are active
+SYNC_JOB_LABELS = {"incremental": "Incremental sync", "full_resync": "Full resync"}
+SYNC_STATUS_JOBS = 3
+SYNC_STATUS_REFRESH_SECONDS = 5
 
 # Date range selection
 def get_date_range(range_name):
-    today = datetime.now().replace(hour=23, minute=59, second=59)
+    # Drop microseconds so the range (and the cache keys built from it) stay stable between reruns
+    today = datetime.now().replace(hour=23, minute=59, second=59, microsecond=0)
     
     if range_name == "Today":
         start_date = today.replace(hour=0, minute=0, second=0)
@@ -80,6 +102,49 @@ def close_expense_form():
     st.session_state.show_expense_form = False
     st.session_state.edit_expense_id = None
 
+# Function to move the expense table to another page
+def change_expense_page(step):
+    st.session_state.expense_page = max(0, st.session_state.expense_page + step)
+
+# Show a store's recent sync jobs, refreshing the dashboard when one finishes
+def show_sync_jobs(store_id, jobs=None):
+    if jobs is None:
+        jobs = db_utils.get_sync_jobs(store_id, SYNC_STATUS_JOBS)
+    
+    for job in jobs:
+        label = SYNC_JOB_LABELS.get(job['kind'], job['kind'])
+        if job['status'] == "queued":
+            st.info(f"⏳ {label} queued, waiting for a sync worker (`python sync_worker.py`)")
+        elif job['status'] == "running":
+            st.info(f"🔄 {label} running: {job['payments']:,} payments, {job['order_items']:,} order items "
+                    f"in {job['pages']:,} pages")
+        elif job['status'] == "completed":
+            st.caption(f"✅ {label}: {job['message']}")
+        else:
+            st.caption(f"❌ {label}: {job['message']}")
+    
+    # Jobs this session saw queued or running that have since finished
+    watched = st.session_state.active_sync_jobs.get(store_id, set())
+    finished = [job for job in jobs if job['id'] in watched and job['status'] in ("completed", "failed")]
+    st.session_state.active_sync_jobs[store_id] = {
+        job['id'] for job in jobs if job['status'] in ("queued", "running")
+    }
+    
+    if finished:
+        # The worker wrote new rows from another process, so drop this process's cached reads
+        for table in ("payments", "order_items"):
+            db_utils.invalidate_cache(table, {store_id})
+        db_utils.invalidate_cache("sync_log")
+        db_utils.invalidate_cache("stores")
+        
+        # Syncs write windows and pages out of time order, and incremental
+        # syncs update payments created long before the cache's newest row,
+        # so rows behind the cache's watermark may have changed. Rebuild the
+        # local copy from scratch after any sync
+        if local_cache.is_available():
+            local_cache.clear(store_id)
+        st.rerun()
+
 # MAIN APP LAYOUT
 
 # Sidebar
@@ -124,36 +189,45 @@ with st.sidebar:
         selected_range = st.selectbox("Date Range", options=date_ranges, index=date_ranges.index(st.session_state.date_range))
         st.session_state.date_range = selected_range
         
-        # Force sync option
+        # Aggregate from a local Parquet copy of the store's payments
+        use_local_cache = st.toggle(
+            "Use local cache",
+            value=False,
+            disabled=not local_cache.is_available(),
+            help="Keeps payments on this machine and only downloads new ones. Requires pyarrow."
+        )
+        
+        # Syncs are queued for the background worker, so a long resync doesn't block the dashboard
+        # Incremental sync - only fetches changes since the store's last sync
+        if st.button("Sync New Data"):
+            try:
+                job = db_utils.enqueue_sync_job(store_id, "incremental")
+                if job:
+                    st.success("✅ Sync queued")
+                else:
+                    st.error("❌ Could not queue the sync")
+            except Exception as e:
+                st.error(f"❌ Error queueing sync: {str(e)}")
+        
+        # Force sync option - reloads orders with line items expanded from Jan 1, 2024, replacing
+        # the stored range. An interrupted resync picks up from its last saved page
         if st.button("Force Full Resync", type="primary"):
-            st.info("Starting full data resync... This may take a minute.")
-            
-            # Code to perform full resync
             try:
-                start_date = datetime(2024, 1, 1)  # Start from Jan 1, 2024
-                end_date = datetime.now()
-                
-                # Add a spinner to show progress
-                with st.spinner("Syncing data from Clover API..."):
-                    # Call the sync function
-                    sync_result = db_utils.sync_clover_data(store_id, start_date, end_date)
-                    
-                if sync_result["success"]:
-                    st.success(f"✅ {sync_result['message']}")
-                    
-                    # Add more detailed results if available
-                    if "results" in sync_result:
-                        with st.expander("Sync Details"):
-                            st.write(f"Total stores processed: {sync_result['results']['total_stores']}")
-                            st.write(f"Successful stores: {sync_result['results']['successful_stores']}")
-                            st.write(f"Failed stores: {sync_result['results']['failed_stores']}")
-                            st.write(f"Total payments synced: {sync_result['results']['total_payments']}")
-                            st.write(f"Total order items synced: {sync_result['results']['total_order_items']}")
+                job = db_utils.enqueue_sync_job(store_id, "full_resync", datetime(2024, 1, 1))
+                if job:
+                    st.success("✅ Full resync queued")
                 else:
-                    st.error(f"❌ {sync_result['message']}")
+                    st.error("❌ Could not queue the full resync")
             except Exception as e:
-                st.error(f"❌ Error during sync: {str(e)}")
-                st.write("Check connection to Supabase and Clover API credentials")
+                st.error(f"❌ Error queueing full resync: {str(e)}")
+                st.write("Check connection to Supabase")
+        
+        # Sync status, polled only while a job is queued or running
+        sync_jobs = db_utils.get_sync_jobs(store_id, SYNC_STATUS_JOBS)
+        if any(job['status'] in ("queued", "running") for job in sync_jobs):
+            st.experimental_fragment(run_every=SYNC_STATUS_REFRESH_SECONDS)(show_sync_jobs)(store_id)
+        else:
+            show_sync_jobs(store_id, sync_jobs)
     else:
         st.warning("No stores found in database. Please set up your stores in the Streamlit secrets.")
         store_id = None
@@ -178,12 +252,30 @@ if 'store_id' in locals() and store_id:
     
     # Load data for the selected store and date range
     try:
-        payments_df = db_utils.get_payments_by_merchant(store_id, start_date, end_date)
+        # Determine appropriate time grouping based on date range
+        days_diff = (end_date - start_date).days
+        
+        if days_diff <= 1:  # Today or Yesterday
+            # Group by hour
+            bucket, period_format, period_label = 'hour', '%I %p', 'Hour'  # Hour with AM/PM
+        elif days_diff <= 31:  # Last 7/30 days or This/Last Month
+            # Group by day
+            bucket, period_format, period_label = 'day', '%b %d', 'Day'  # Jan 01 format
+        else:  # This Year or All Time
+            # Group by month
+            bucket, period_format, period_label = 'month', '%b %Y', 'Month'  # Jan 2023 format
         
-        if not payments_df.empty:
+        # Totals and the time series are aggregated in the database, or
+        # locally when the store's payments are cached on this machine
+        if use_local_cache:
+            sales_summary = local_cache.get_sales_summary(store_id, start_date, end_date, bucket)
+        else:
+            sales_summary = db_utils.get_sales_summary(store_id, start_date, end_date, bucket)
+        
+        if sales_summary['order_count'] > 0:
             # Calculate metrics
-            order_count = len(payments_df)
-            total_sales = payments_df['amount'].sum() / 100  # Convert cents to dollars
+            order_count = sales_summary['order_count']
+            total_sales = sales_summary['total_sales']
             avg_order_value = total_sales / order_count if order_count > 0 else 0
             
             # METRICS SECTION
@@ -204,30 +296,14 @@ if 'store_id' in locals() and store_id:
             # SALES OVER TIME SECTION
             st.subheader("Sales Over Time")
             
-            # Prepare data for time-based analysis
-            payments_df['created_at'] = pd.to_datetime(payments_df['created_at'])
-            
-            # Determine appropriate time grouping based on date range
-            days_diff = (end_date - start_date).days
-            
-            if days_diff <= 1:  # Today or Yesterday
-                # Group by hour
-                payments_df['time_period'] = payments_df['created_at'].dt.strftime('%I %p')  # Hour with AM/PM
-                period_label = 'Hour'
-            elif days_diff <= 31:  # Last 7/30 days or This/Last Month
-                # Group by day
-                payments_df['time_period'] = payments_df['created_at'].dt.strftime('%b %d')  # Jan 01 format
-                period_label = 'Day'
-            else:  # This Year or All Time
-                # Group by month
-                payments_df['time_period'] = payments_df['created_at'].dt.strftime('%b %Y')  # Jan 2023 format
-                period_label = 'Month'
-            
-            # Create time-based aggregations
-            sales_over_time = payments_df.groupby('time_period').agg(
-                Total_Sales=('amount', lambda x: sum(x) / 100),
-                Order_Count=('id', 'count')
-            ).reset_index()
+            # Zero-fill the pre-aggregated buckets across the range so gaps show up;
+            # All Time starts at the first sale rather than the far-past sentinel date
+            series_start = None if st.session_state.date_range == "All Time" else start_date
+            sales_over_time = db_utils.build_sales_series(
+                sales_summary['series'], series_start, end_date, bucket,
+                time_column='bucket', sales_column='total_sales', count_column='order_count'
+            ).rename(columns={'total_sales': 'Total_Sales', 'order_count': 'Order_Count'})
+            sales_over_time['time_period'] = sales_over_time['bucket'].dt.strftime(period_format)
             
             # Create sales over time chart
             fig = go.Figure()
@@ -270,25 +346,55 @@ if 'store_id' in locals() and store_id:
             expense_col1, expense_col2 = st.columns([3, 1])
             
             with expense_col1:
-                # Get expense data
-                expenses_df = db_utils.get_expenses_by_store(store_id, start_date, end_date)
-                
-                if not expenses_df.empty:
-                    # Calculate total expenses
-                    total_expenses = expenses_df['amount'].sum()
-                    st.metric("Total Expenses", format_currency(total_expenses))
-                else:
-                    st.metric("Total Expenses", "$0.00")
+                # The total is summed by the database, not from the rows shown here
+                total_expenses = db_utils.get_expense_total(store_id, start_date, end_date)
+                st.metric("Total Expenses", format_currency(total_expenses))
             
             with expense_col2:
                 # Button to add a new expense
                 st.button("📝 Add Expense", on_click=open_expense_form, args=(store_id, None))
             
+            # Only the visible page of expenses is fetched, sorted by the database
+            sort_label = st.selectbox("Sort expenses by", options=list(EXPENSE_SORT_OPTIONS), key="expense_sort")
+            
+            # Go back to the first page whenever the store, range or sort changes
+            expense_view = (store_id, start_date, end_date, sort_label)
+            if st.session_state.get("expense_view") != expense_view:
+                st.session_state.expense_view = expense_view
+                st.session_state.expense_page = 0
+            
+            expense_page = db_utils.get_expenses_page(
+                store_id, start_date, end_date,
+                offset=st.session_state.expense_page * db_utils.EXPENSE_PAGE_SIZE,
+                limit=db_utils.EXPENSE_PAGE_SIZE,
+                sort=EXPENSE_SORT_OPTIONS[sort_label]
+            )
+            expenses_df = expense_page['rows']
+            page_count = max(1, math.ceil(expense_page['total_count'] / db_utils.EXPENSE_PAGE_SIZE))
+            
+            # A delete can leave the current page past the end
+            if expenses_df.empty and st.session_state.expense_page >= page_count and expense_page['total_count']:
+                st.session_state.expense_page = page_count - 1
+                st.rerun()
+            
             # Expense table
             if not expenses_df.empty:
-                # Process expenses for display
-                expenses_df['date'] = pd.to_datetime(expenses_df['date']).dt.strftime('%Y-%m-%d')
-                expenses_df['amount'] = expenses_df['amount'].apply(lambda x: format_currency(x))
+                # Build one row per visible expense, escaping user-entered text
+                expense_rows = "".join(
+                    f"""
+                    <tr class="table-row">
+                        <td>{pd.to_datetime(expense.date).strftime('%Y-%m-%d')}</td>
+                        <td>{format_currency(expense.amount)}</td>
+                        <td><span class="category-tag">{html.escape(str(expense.category))}</span></td>
+                        <td>{html.escape(str(expense.description))}</td>
+                        <td class="actions">
+                            <button class="action-btn edit-btn" onclick="editExpense({expense.id})">✏️</button>
+                            <button class="action-btn delete-btn" onclick="deleteExpense({expense.id})">🗑️</button>
+                        </td>
+                    </tr>
+                    """
+                    for expense in expenses_df.itertuples(index=False)
+                )
                 
                 # Create an HTML table with edit/delete buttons
                 html_table = """
@@ -375,24 +481,7 @@ if 'store_id' in locals() and store_id:
                     </tr>
                 </thead>
                 <tbody>
-                """
-                
-                # Add rows for each expense
-                for _, expense in expenses_df.iterrows():
-                    html_table += f"""
-                    <tr class="table-row">
-                        <td>{expense['date']}</td>
-                        <td>{expense['amount']}</td>
-                        <td><span class="category-tag">{expense['category']}</span></td>
-                        <td>{expense['description']}</td>
-                        <td class="actions">
-                            <button class="action-btn edit-btn" onclick="editExpense({expense['id']})">✏️</button>
-                            <button class="action-btn delete-btn" onclick="deleteExpense({expense['id']})">🗑️</button>
-                        </td>
-                    </tr>
-                    """
-                
-                html_table += """
+                """ + expense_rows + """
                 </tbody>
                 </table>
                 </div>
@@ -423,6 +512,18 @@ if 'store_id' in locals() and store_id:
                 # Display the HTML table
                 st.components.v1.html(html_table, height=400, scrolling=True)
                 
+                # Page controls
+                prev_col, page_col, next_col = st.columns([1, 2, 1])
+                with prev_col:
+                    st.button("◀ Previous", on_click=change_expense_page, args=(-1,),
+                              disabled=st.session_state.expense_page == 0)
+                with page_col:
+                    st.write(f"Page {st.session_state.expense_page + 1} of {page_count} "
+                             f"({expense_page['total_count']} expenses)")
+                with next_col:
+                    st.button("Next ▶", on_click=change_expense_page, args=(1,),
+                              disabled=st.session_state.expense_page + 1 >= page_count)
+                
                 # Handle edit/delete actions with a hidden Streamlit component
                 action_placeholder = st.empty()
                 action_data = action_placeholder.text_input("Action", value="", key="expense_action", label_visibility="collapsed")
@@ -462,14 +563,13 @@ if 'store_id' in locals() and store_id:
                 description_value = ""
                 
                 # If editing, load the expense data
-                if st.session_state.edit_expense_id is not None:
-                    # Here you would fetch the expense data from the database
+                if st.session_state.edit_expense_id is not None and not expenses_df.empty:
+                    # Expenses can only be edited from the visible page, so it holds the row
                     expense_data = expenses_df[expenses_df['id'] == st.session_state.edit_expense_id]
                     if not expense_data.empty:
                         expense = expense_data.iloc[0]
                         date_value = pd.to_datetime(expense['date'])
-                        # Remove $ and commas from amount
-                        amount_value = float(expense['amount'].replace('$', '').replace(',', ''))
+                        amount_value = float(expense['amount'])
                         category_value = expense['category']
                         description_value = expense['description']
                 
@@ -0,0 +1,46 @@
+import streamlit as st
+import pandas as pd
+import cloud_db_utils as db_utils
+
+st.set_page_config(page_title="Order Item Timestamp Backfill", layout="wide")
+st.title("🕒 Order Item Timestamp Backfill")
+st.write("This utility repairs order items that were saved with the time of the sync instead of the time of the sale")
+
+st.info(
+    "Run create_tables.py first so the stale_order_item_orders and set_order_item_times "
+    "functions exist. Orders with items timestamped after their first payment are fetched "
+    "again from Clover in batches, their items get the same timestamp a sync writes, and "
+    "stale copies of items that were re-synced are removed."
+)
+
+# Stores to repair
+stores_df = db_utils.get_all_stores()
+
+if stores_df.empty:
+    st.warning("No stores found in database.")
+    st.stop()
+
+store_names = stores_df['name'].tolist()
+selected_stores = st.multiselect("Stores", options=store_names, default=store_names)
+batch_size = st.number_input("Orders per batch", min_value=50, max_value=5000,
+                             value=db_utils.ITEM_BACKFILL_BATCH, step=50)
+
+if st.button("Run Backfill"):
+    results = []
+
+    for store_name in selected_stores:
+        merchant_id = stores_df[stores_df['name'] == store_name].iloc[0]['merchant_id']
+        store = db_utils.get_store_by_merchant_id(merchant_id)
+        st.subheader(f"Repairing store: {store_name}")
+        status = st.empty()
+
+        def show_progress(total, status=status):
+            status.write(f"Repaired {total} order items so far...")
+
+        repaired = db_utils.backfill_order_item_times(store, int(batch_size), progress=show_progress)
+        status.success(f"✅ Repaired {repaired} order items")
+        results.append({"Store": store_name, "Repaired": repaired})
+
+    if results:
+        st.divider()
+        st.dataframe(pd.DataFrame(results), use_container_width=True)
@@ -0,0 +1,4 @@
+"""
+Headless benchmarks for the sync and dashboard data paths.
+Run with `python -m benchmarks.run_benchmarks` from the project root.
+"""
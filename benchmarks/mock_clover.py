@@ -0,0 +1,216 @@
+"""
+Mock Clover API
+A local HTTP server that serves synthetic payments, orders and line items
+in the shape of the Clover REST API. Rows are generated from their index,
+so a merchant with millions of payments costs no memory. Supports the
+createdTime/modifiedTime filters, offset/limit paging, orderBy and the
+expand options the sync code uses, with configurable per-request latency
+and an extra delay that grows with the offset, like a deep OFFSET scan.
+"""
+
+import json
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+MOCK_START_MS = 1704067200000  # 2024-01-01 00:00:00 UTC
+FILTER_PATTERN = re.compile(r"^(createdTime|modifiedTime)(>=|<=|>|<|=)(\d+)$")
+
+class SyntheticMerchant:
+    """
+    Deterministic sales history for one merchant.
+
+    Payment i is created at start_ms + i * step_ms. Every payments_per_order
+    consecutive payments share an order, created with its first payment,
+    and each order has items_per_order line items.
+    """
+
+    def __init__(self, payments, start_ms=MOCK_START_MS, span_days=365, payments_per_order=2, items_per_order=1):
+        self.payments = payments
+        self.start_ms = start_ms
+        self.step_ms = max(1, (span_days * 86_400_000) // max(1, payments))
+        self.payments_per_order = payments_per_order
+        self.items_per_order = items_per_order
+        self.orders = math.ceil(payments / payments_per_order)
+
+    @property
+    def end_ms(self):
+        return self.start_ms + (self.payments - 1) * self.step_ms
+
+    def payment_time(self, index):
+        return self.start_ms + index * self.step_ms
+
+    def order_time(self, index):
+        return self.payment_time(index * self.payments_per_order)
+
+    def payment(self, index, expand_order=False):
+        order_index = index // self.payments_per_order
+        order = {"id": f"ORD{order_index:010d}"}
+        if expand_order:
+            order["createdTime"] = self.order_time(order_index)
+        created = self.payment_time(index)
+        return {
+            "id": f"PAY{index:010d}",
+            "amount": 100 + (index * 7919) % 9900,
+            "createdTime": created,
+            "modifiedTime": created,
+            "result": "SUCCESS",
+            "order": order
+        }
+
+    def line_items(self, order_index):
+        created = self.order_time(order_index)
+        return [
+            {
+                "id": f"LI{order_index:010d}{n:02d}",
+                "name": f"Item {(order_index + n) % 50}",
+                "price": 100 + ((order_index + n) * 104729) % 4900,
+                "createdTime": created
+            }
+            for n in range(self.items_per_order)
+        ]
+
+    def order(self, index, expand):
+        created = self.order_time(index)
+        order = {"id": f"ORD{index:010d}", "createdTime": created, "modifiedTime": created}
+        if "lineItems" in expand:
+            order["lineItems"] = {"elements": self.line_items(index)}
+        if "payments" in expand:
+            first = index * self.payments_per_order
+            last = min(self.payments, first + self.payments_per_order)
+            order["payments"] = {"elements": [self.payment(i) for i in range(first, last)]}
+        return order
+
+def _index_range(filters, start_ms, step_ms, count):
+    """Translate time filters into the inclusive index range [low, high] they select"""
+    low, high = 0, count - 1
+    for term in filters:
+        match = FILTER_PATTERN.match(term.replace(" ", ""))
+        if not match:
+            continue
+        _, op, value = match.groups()
+        value = int(value)
+        if op in (">=", ">", "="):
+            bound = value + (1 if op == ">" else 0)
+            low = max(low, math.ceil((bound - start_ms) / step_ms))
+        if op in ("<=", "<", "="):
+            bound = value - (1 if op == "<" else 0)
+            high = min(high, math.floor((bound - start_ms) / step_ms))
+    return low, high
+
+def _page_indices(low, high, offset, limit, descending):
+    """Indices for one page of the selected range"""
+    if high < low:
+        return range(0)
+    if descending:
+        first = high - offset
+        return range(first, max(low, first - limit + 1) - 1, -1)
+    first = low + offset
+    return range(first, min(high, first + limit - 1) + 1)
+
+class MockCloverServer:
+    """
+    Serve synthetic merchants over HTTP.
+
+    Args:
+        merchants: Dict of merchant ID -> SyntheticMerchant
+        latency: Seconds to sleep before answering each request
+        offset_latency: Extra seconds per 1000 rows skipped by the offset
+    """
+
+    def __init__(self, merchants, latency=0.0, offset_latency=0.0, host="127.0.0.1", port=0):
+        self.merchants = merchants
+        self.latency = latency
+        self.offset_latency = offset_latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v3"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def handle(self, path, query):
+        """Build the (status, body) answer for a GET request"""
+        parts = [part for part in path.split("/") if part]
+        if len(parts) < 4 or parts[:2] != ["v3", "merchants"] or parts[2] not in self.merchants:
+            return 404, {"message": "Not Found"}
+
+        merchant = self.merchants[parts[2]]
+        resource = parts[3:]
+        filters = query.get("filter", [])
+        expand = set(",".join(query.get("expand", [])).split(","))
+        limit = min(int(query.get("limit", ["100"])[0]), 1000)
+        offset = int(query.get("offset", ["0"])[0])
+        descending = "ASC" not in query.get("orderBy", ["createdTime DESC"])[0].upper()
+
+        if resource == ["payments"]:
+            low, high = _index_range(filters, merchant.start_ms, merchant.step_ms, merchant.payments)
+            elements = [merchant.payment(i, "order" in expand)
+                        for i in _page_indices(low, high, offset, limit, descending)]
+            return 200, {"elements": elements}
+
+        if resource == ["orders"]:
+            low, high = _index_range(filters, merchant.start_ms, merchant.step_ms * merchant.payments_per_order,
+                                     merchant.orders)
+            elements = [merchant.order(i, expand) for i in _page_indices(low, high, offset, limit, descending)]
+            return 200, {"elements": elements}
+
+        if len(resource) == 3 and resource[0] == "orders" and resource[2] == "line_items":
+            order_id = resource[1]
+            if not order_id.startswith("ORD"):
+                return 404, {"message": "Not Found"}
+            return 200, {"elements": merchant.line_items(int(order_id[3:]))}
+
+        return 404, {"message": "Not Found"}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server._count_request()
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                delay = server.latency + server.offset_latency * int(query.get("offset", ["0"])[0]) / 1000
+                if delay:
+                    time.sleep(delay)
+                status, body = server.handle(url.path, query)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,537 @@
+"""
+Mock PostgREST
+A local in-memory stand-in for the Supabase REST API. It implements the
+subset the dashboard uses: upserts with on_conflict, eq/gt/gte/lt/lte/in/is
+filters, select, order, limit, keyset or=() cursors, or=(and(...)) groups,
+Range paging and count=exact, and filtered PATCHes and DELETEs. The database functions on
+the sync and dashboard paths (refresh_daily_sales, get_sales_summary,
+get_expense_total, ensure_sales_partitions and purge_merchant_history) are
+answered from an in-memory daily_sales rollup and the stored tables; any
+other RPC answers 404 like a function that isn't installed. Every request
+can be delayed to model network latency.
+"""
+
+import bisect
+import datetime
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl, unquote
+
+# Columns compared as instants rather than strings
+TIMESTAMP_COLUMNS = {"created_at", "updated_at", "sync_time", "last_sync_date", "window_start", "window_end",
+                     "started_at", "heartbeat_at", "finished_at"}
+
+# Tables whose rows are kept; writes to any other table are only counted
+STORED_TABLES = {"payments", "order_items", "expenses", "sync_log", "stores", "sync_checkpoints", "sync_jobs"}
+
+# Lengths of the ISO timestamp prefixes get_sales_summary truncates buckets to
+BUCKET_PREFIXES = {"hour": 13, "day": 10, "month": 7}
+BUCKET_START = "0000-01-01T00:00:00"  # Completes a truncated prefix to the start of its bucket
+
+KEYSET_PATTERN = re.compile(r"^\((\w+)\.gt\.(.+),and\(\1\.eq\.(.+),(\w+)\.gt\.(.+)\)\)$")
+AND_GROUP_PATTERN = re.compile(r"and\(([^()]*)\)")
+
+def normalize_timestamp(value):
+    """Convert an ISO timestamp to naive UTC with microseconds, so strings compare as instants"""
+    if value is None or value == "":
+        return value
+    parsed = datetime.datetime.fromisoformat(str(value).strip('"').replace(" ", "T").replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat(timespec="microseconds")
+
+def _coerce(column, value, sample=None):
+    """Convert a filter value to the type of the column's stored sample value"""
+    value = unquote(value).strip('"')
+    if column in TIMESTAMP_COLUMNS:
+        return normalize_timestamp(value)
+    if isinstance(sample, bool):
+        return value == "true"
+    if isinstance(sample, (int, float)):
+        return float(value)
+    return value
+
+class Table:
+    """
+    Rows of one table stored as tuples, with an id index and a (created_at, id)
+    sort order rebuilt lazily after writes.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.columns = []
+        self.positions = {}
+        self.rows = {}
+        self.by_id = {}
+        self.written = 0
+        self.next_id = 1
+        self._sorted = None
+
+    def _add_columns(self, names):
+        for name in names:
+            if name not in self.positions:
+                self.positions[name] = len(self.columns)
+                self.columns.append(name)
+                # Existing rows get NULL for the new column
+                self.rows = {key: row + (None,) for key, row in self.rows.items()}
+
+    def value(self, row, column):
+        position = self.positions.get(column)
+        if position is None or position >= len(row):
+            return None
+        return row[position]
+
+    def as_dict(self, row, select=None):
+        names = select or self.columns
+        values = {}
+        for name in names:
+            value = self.value(row, name)
+            if name in TIMESTAMP_COLUMNS and value:
+                value += "+00:00"
+            values[name] = value
+        return values
+
+    def upsert(self, records, conflict_columns):
+        """Insert or merge records keyed on conflict_columns (or a new serial id)"""
+        self.written += len(records)
+        if self.name not in STORED_TABLES:
+            return []
+
+        names = set()
+        for record in records:
+            names.update(record)
+        self._add_columns(sorted(names | {"id"}))
+
+        stored = []
+        for record in records:
+            record = dict(record)
+            for column in TIMESTAMP_COLUMNS & record.keys():
+                record[column] = normalize_timestamp(record[column])
+            if record.get("id") is None:
+                record["id"] = self.next_id
+                self.next_id += 1
+
+            key = tuple(record.get(column) for column in conflict_columns)
+            existing = self.rows.get(key)
+            if existing is not None:
+                merged = list(existing)
+                for column, value in record.items():
+                    merged[self.positions[column]] = value
+                row = tuple(merged)
+            else:
+                row = tuple(record.get(column) for column in self.columns)
+                self.by_id.setdefault(record["id"], set()).add(key)
+
+            self.rows[key] = row
+            stored.append(row)
+
+        self._sorted = None
+        return stored
+
+    def update(self, filters, data):
+        """Set data's columns on the rows matching filters and return them"""
+        self._add_columns(sorted(data))
+        data = dict(data)
+        for column in TIMESTAMP_COLUMNS & data.keys():
+            data[column] = normalize_timestamp(data[column])
+        updated = []
+        for key, row in list(self.rows.items()):
+            if self.matches(row, filters):
+                merged = list(row)
+                for column, value in data.items():
+                    merged[self.positions[column]] = value
+                self.rows[key] = tuple(merged)
+                updated.append(self.rows[key])
+        self._sorted = None
+        return updated
+
+    def delete(self, filters):
+        """Remove the rows matching filters"""
+        for key, row in list(self.rows.items()):
+            if self.matches(row, filters):
+                del self.rows[key]
+                self.by_id.get(self.value(row, "id"), set()).discard(key)
+        self._sorted = None
+
+    def sorted_rows(self):
+        """Rows ordered by (created_at, id), rebuilt after writes"""
+        if self._sorted is None:
+            rows = list(self.rows.values())
+            keys = [(self.value(row, "created_at") or "", str(self.value(row, "id"))) for row in rows]
+            order = sorted(range(len(rows)), key=keys.__getitem__)
+            self._sorted = ([keys[i] for i in order], [rows[i] for i in order])
+        return self._sorted
+
+    def matches(self, row, filters):
+        for column, op, value in filters:
+            if op == "any":
+                if not any(self.matches(row, group) for group in value):
+                    return False
+                continue
+            stored = self.value(row, column)
+            if op == "in":
+                if str(stored) not in value:
+                    return False
+                continue
+            if op == "is":
+                if (stored is None) != (value == "null"):
+                    return False
+                continue
+            if stored is None:
+                return False
+            if isinstance(stored, (int, float)) and not isinstance(value, str):
+                stored = float(stored)
+            if op == "eq" and not stored == value:
+                return False
+            if op == "neq" and not stored != value:
+                return False
+            if op == "gt" and not stored > value:
+                return False
+            if op == "gte" and not stored >= value:
+                return False
+            if op == "lt" and not stored < value:
+                return False
+            if op == "lte" and not stored <= value:
+                return False
+        return True
+
+    def select(self, filters, order, keyset=None, offset=0, limit=None):
+        """
+        Filter, order and page rows.
+
+        Returns:
+            Tuple of (page rows, total matching rows)
+        """
+        id_filter = next((value for column, op, value in filters if column == "id" and op == "in"), None)
+        if id_filter is not None:
+            candidates = [self.rows[key] for row_id in id_filter for key in self.by_id.get(row_id, ())]
+            candidates += [self.rows[key] for row_id in id_filter if row_id.isdigit()
+                           for key in self.by_id.get(int(row_id), ())]
+        elif order == [("created_at", "asc"), ("id", "asc")]:
+            # Keyset reads walk the sorted order from the cursor instead of scanning everything
+            keys, rows = self.sorted_rows()
+            start = bisect.bisect_right(keys, keyset) if keyset else 0
+            low = [value for column, op, value in filters if column == "created_at" and op == "gte"]
+            high = [value for column, op, value in filters if column == "created_at" and op == "lte"]
+            if low:
+                start = max(start, bisect.bisect_left(keys, (max(low), "")))
+            stop = bisect.bisect_right(keys, (min(high), "\uffff")) if high else len(rows)
+            wanted = None if limit is None else offset + limit
+            page = []
+            for position in range(start, stop):
+                if self.matches(rows[position], filters):
+                    page.append(rows[position])
+                    if wanted is not None and len(page) >= wanted:
+                        break
+            return page[offset:], None
+        else:
+            candidates = self.rows.values()
+
+        matched = [row for row in candidates if self.matches(row, filters)]
+        for column, direction in reversed(order):
+            matched.sort(key=lambda row: (self.value(row, column) is None, self.value(row, column)),
+                         reverse=direction == "desc")
+        total = len(matched)
+        end = None if limit is None else offset + limit
+        return matched[offset:end], total
+
+class MockPostgrestServer:
+    """
+    Serve an in-memory database over the PostgREST protocol.
+
+    Args:
+        latency: Seconds to sleep before answering each request
+    """
+
+    def __init__(self, latency=0.0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.tables = {}
+        self.daily_sales = {}
+        self.rpc_calls = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def project_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def table(self, name):
+        with self._lock:
+            if name not in self.tables:
+                self.tables[name] = Table(name)
+            return self.tables[name]
+
+    def seed(self, name, records, on_conflict="id"):
+        """Insert rows directly, e.g. stores and expenses before a benchmark"""
+        table = self.table(name)
+        with self._lock:
+            table.upsert(records, on_conflict.split(","))
+
+    def parse_query(self, table, query):
+        """Split a query string into (filters, order, select, keyset, limit)"""
+        filters, order, select, keyset, limit = [], [], None, None, None
+
+        for key, value in parse_qsl(query, keep_blank_values=True):
+            if key == "select":
+                select = value.split(",")
+            elif key == "order":
+                for term in value.split(","):
+                    column, _, direction = term.partition(".")
+                    order.append((column, direction or "asc"))
+            elif key == "limit":
+                limit = int(value)
+            elif key == "or":
+                match = KEYSET_PATTERN.match(value)
+                if match:
+                    column, _, last_value, _, last_id = match.groups()
+                    keyset = (_coerce(column, last_value), unquote(last_id).strip('"'))
+                else:
+                    # or=(and(a.eq.x,b.eq.y),...) matches rows meeting every term of any group
+                    groups = []
+                    for group in AND_GROUP_PATTERN.findall(value):
+                        terms = []
+                        for term in group.split(","):
+                            column, op, operand = term.split(".", 2)
+                            terms.append((column, op, _coerce(column, operand)))
+                        groups.append(terms)
+                    filters.append(("or", "any", groups))
+            else:
+                op, _, operand = value.partition(".")
+                if op == "in":
+                    operand = {unquote(item).strip('"') for item in operand.strip("()").split(",")}
+                elif op == "is":
+                    operand = operand.lower()
+                else:
+                    sample = next(iter(table.rows.values()), None)
+                    operand = _coerce(key, operand, None if sample is None else table.value(sample, key))
+                filters.append((key, op, operand))
+        return filters, order, select, keyset, limit
+
+    def handle_get(self, name, query, headers):
+        """Answer a GET; returns (status, body, extra headers)"""
+        table = self.table(name)
+        filters, order, select, keyset, limit = self.parse_query(table, query)
+
+        offset = 0
+        if headers.get("Range"):
+            first, _, last = headers["Range"].partition("-")
+            offset = int(first)
+            limit = int(last) - offset + 1
+
+        with self._lock:
+            rows, total = table.select(filters, order, keyset, offset, limit)
+            body = [table.as_dict(row, select) for row in rows]
+
+        extra = {}
+        if "count=exact" in headers.get("Prefer", ""):
+            if total is None:
+                total = len(body)
+            if offset and offset >= total:
+                return 416, {"message": "Requested range not satisfiable"}, {"Content-Range": f"*/{total}"}
+            end = offset + len(body) - 1
+            extra["Content-Range"] = f"{offset}-{end}/{total}" if body else f"*/{total}"
+        return 200, body, extra
+
+    def handle_post(self, name, query, headers, body):
+        """Answer an insert/upsert POST; returns (status, body, extra headers)"""
+        records = json.loads(body or b"[]")
+        if isinstance(records, dict):
+            records = [records]
+        params = dict(parse_qsl(query))
+        table = self.table(name)
+        with self._lock:
+            stored = table.upsert(records, params.get("on_conflict", "id").split(","))
+            result = [table.as_dict(row) for row in stored]
+        if "return=minimal" in headers.get("Prefer", ""):
+            return 201, None, {}
+        return 201, result, {}
+
+    def handle_patch(self, name, query, headers, body):
+        """Answer a filtered PATCH; returns (status, body, extra headers)"""
+        table = self.table(name)
+        filters = self.parse_query(table, query)[0]
+        with self._lock:
+            updated = table.update(filters, json.loads(body or b"{}"))
+            result = [table.as_dict(row) for row in updated]
+        if "return=representation" not in headers.get("Prefer", ""):
+            return 204, None, {}
+        return 200, result, {}
+
+    def handle_delete(self, name, query):
+        """Answer a filtered DELETE; returns (status, body, extra headers)"""
+        table = self.table(name)
+        filters = self.parse_query(table, query)[0]
+        with self._lock:
+            table.delete(filters)
+        return 204, None, {}
+
+    def _hours(self, merchant_id, start, end):
+        """Rollup keys of a merchant's buckets with start <= hour < end"""
+        return [key for key in self.daily_sales if key[0] == merchant_id and start <= key[1] < end]
+
+    def refresh_daily_sales(self, params):
+        """Rebuild the hourly rollup buckets covering [p_start, p_end], like the SQL function"""
+        merchant_id = params["p_merchant_id"]
+        start = normalize_timestamp(params["p_start"])[:13]
+        end = normalize_timestamp(params["p_end"])[:13] + "\uffff"
+        payments = self.table("payments")
+        with self._lock:
+            for key in self._hours(merchant_id, start, end):
+                del self.daily_sales[key]
+
+            keys, rows = payments.sorted_rows()
+            first = bisect.bisect_left(keys, (start, ""))
+            last = bisect.bisect_right(keys, (end, ""))
+            buckets = {}
+            for row in rows[first:last]:
+                if payments.value(row, "merchant_id") != merchant_id:
+                    continue
+                bucket = buckets.setdefault(payments.value(row, "created_at")[:13], [0, 0])
+                bucket[0] += payments.value(row, "amount") or 0
+                bucket[1] += 1
+            for hour, totals in buckets.items():
+                self.daily_sales[(merchant_id, hour)] = totals
+        return len(buckets)
+
+    def get_sales_summary(self, params):
+        """Sum the rollup into p_bucket buckets, like the SQL function"""
+        start = normalize_timestamp(params["p_start"])[:13]
+        end = normalize_timestamp(params["p_end"])[:13] + "\uffff"
+        width = BUCKET_PREFIXES[params.get("p_bucket") or "day"]
+        series = {}
+        with self._lock:
+            for key in self._hours(params["p_merchant_id"], start, end):
+                bucket = series.setdefault(key[1][:width], [0, 0])
+                bucket[0] += self.daily_sales[key][0]
+                bucket[1] += self.daily_sales[key][1]
+        return [
+            {"bucket": prefix + BUCKET_START[len(prefix):], "total_amount": totals[0], "payment_count": totals[1]}
+            for prefix, totals in sorted(series.items())
+        ]
+
+    def get_expense_total(self, params):
+        """Add up a store's expenses in the date range, like the SQL function"""
+        filters = [("store_id", "eq", params["p_store_id"])]
+        if params.get("p_start"):
+            filters.append(("date", "gte", params["p_start"]))
+        if params.get("p_end"):
+            filters.append(("date", "lte", params["p_end"]))
+        expenses = self.table("expenses")
+        with self._lock:
+            rows, _ = expenses.select(filters, [])
+            return sum(expenses.value(row, "amount") or 0 for row in rows)
+
+    def purge_merchant_history(self, params):
+        """Delete a merchant's payments, order items and rollup in a time range"""
+        merchant_id = params["p_merchant_id"]
+        start = normalize_timestamp(params["p_start"])
+        end = normalize_timestamp(params["p_end"])
+        filters = [("merchant_id", "eq", merchant_id), ("created_at", "gte", start), ("created_at", "lte", end)]
+        tables = [self.table(name) for name in ("payments", "order_items")]
+        with self._lock:
+            for table in tables:
+                table.delete(filters)
+            for key in self._hours(merchant_id, start[:10], end[:10] + "\uffff"):
+                del self.daily_sales[key]
+        return 0
+
+    def handle_rpc(self, name, body):
+        """Answer a POST to rest/v1/rpc/<name>; returns (status, body, extra headers)"""
+        functions = {
+            "refresh_daily_sales": self.refresh_daily_sales,
+            "get_sales_summary": self.get_sales_summary,
+            "get_expense_total": self.get_expense_total,
+            "ensure_sales_partitions": lambda params: 0,
+            "purge_merchant_history": self.purge_merchant_history
+        }
+        if name not in functions:
+            return 404, {"code": "PGRST202", "message": f"Could not find the function public.{name}"}, {}
+        with self._lock:
+            self.rpc_calls[name] = self.rpc_calls.get(name, 0) + 1
+        return 200, functions[name](json.loads(body or b"{}")), {}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _answer(self, status, body, extra):
+                payload = b"" if body is None else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in extra.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _route(self, rpc=False):
+                with server._lock:
+                    server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                url = urlparse(self.path)
+                parts = [part for part in url.path.split("/") if part]
+                if rpc and parts[:3] == ["rest", "v1", "rpc"] and len(parts) == 4:
+                    return f"rpc/{parts[3]}", url.query
+                if parts[:2] != ["rest", "v1"] or len(parts) != 3:
+                    return None, url.query
+                return parts[2], url.query
+
+            def do_GET(self):
+                name, query = self._route()
+                if name is None:
+                    return self._answer(404, {"message": "Not Found"}, {})
+                self._answer(*server.handle_get(name, query, self.headers))
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length)
+                name, query = self._route(rpc=True)
+                if name is None:
+                    return self._answer(404, {"message": "Not Found"}, {})
+                if name.startswith("rpc/"):
+                    return self._answer(*server.handle_rpc(name[4:], body))
+                self._answer(*server.handle_post(name, query, self.headers, body))
+
+            def do_PATCH(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length)
+                name, query = self._route()
+                if name is None:
+                    return self._answer(404, {"message": "Not Found"}, {})
+                self._answer(*server.handle_patch(name, query, self.headers, body))
+
+            def do_DELETE(self):
+                name, query = self._route()
+                if name is None:
+                    return self._answer(404, {"message": "Not Found"}, {})
+                self._answer(*server.handle_delete(name, query))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,227 @@
+"""
+Benchmark Runner
+Times the sync, archive reprocessing and dashboard hot paths against the
+local mock Clover API and mock PostgREST at several payment volumes. Results print as a table and can
+be saved as JSON and compared with an earlier run to catch regressions.
+
+    python -m benchmarks.run_benchmarks --sizes 1000,100000 --json results.json
+    python -m benchmarks.run_benchmarks --baseline results.json --tolerance 0.2
+"""
+
+import argparse
+import datetime
+import json
+import sys
+import tempfile
+import time
+
+import streamlit.logger
+
+import clover_client
+import cloud_db_utils as db_utils
+import raw_archive
+from benchmarks.mock_clover import MockCloverServer, SyntheticMerchant, MOCK_START_MS
+from benchmarks.mock_postgrest import MockPostgrestServer
+
+DEFAULT_SIZES = "1000,100000,1000000"
+BENCH_ACCESS_TOKEN = "benchmark-token"
+BENCH_EXPENSES = 500  # Expenses seeded for the dashboard load
+BENCH_SPAN_DAYS = 365  # Payments are spread evenly over this many days
+UNLIMITED_RATE = 1_000_000  # Requests per second when Clover's limits are lifted
+
+def configure(clover_url, project_url, realistic_limits):
+    """Point the Clover client and Supabase helpers at the mock servers"""
+    clover_client.CLOVER_BASE_URL = clover_url
+    db_utils._supabase_client = {
+        "project_url": project_url,
+        "headers": {
+            "apikey": "benchmark",
+            "Authorization": "Bearer benchmark",
+            "Content-Type": "application/json",
+            "Prefer": "return=representation"
+        }
+    }
+    with db_utils._cache_lock:
+        db_utils._cache.clear()
+    with db_utils._partitions_lock:
+        db_utils._known_partitions.clear()
+
+    # Buckets are created per merchant, so new limits apply to the next client
+    if not realistic_limits:
+        clover_client.CLOVER_TOKEN_RATE = UNLIMITED_RATE
+        clover_client.CLOVER_MERCHANT_RATE = UNLIMITED_RATE
+
+def seed_database(postgrest, merchant_id):
+    """Create the store and expenses the dashboard reads"""
+    postgrest.seed("stores", [{"id": 1, "merchant_id": merchant_id, "name": f"Benchmark {merchant_id}",
+                               "access_token": BENCH_ACCESS_TOKEN}])
+    start = datetime.date(2024, 1, 1)
+    categories = db_utils.get_expense_categories()
+    postgrest.seed("expenses", [
+        {
+            "id": i + 1,
+            "store_id": merchant_id,
+            "date": (start + datetime.timedelta(days=i % BENCH_SPAN_DAYS)).isoformat(),
+            "amount": float(10 + (i * 37) % 990),
+            "category": categories[i % len(categories)],
+            "description": f"Expense {i}",
+            "created_at": datetime.datetime(2024, 1, 1).isoformat()
+        }
+        for i in range(BENCH_EXPENSES)
+    ])
+
+def load_dashboard(merchant_id, start_date, end_date):
+    """Run the reads app.py makes to render a store's dashboard"""
+    db_utils.get_all_stores()
+    db_utils.get_last_sync()
+    summary = db_utils.get_sales_summary(merchant_id, start_date, end_date, "month")
+    db_utils.build_sales_series(summary["series"], start_date, end_date, "month", time_column="bucket",
+                                sales_column="total_sales", count_column="order_count")
+    db_utils.get_expense_total(merchant_id, start_date, end_date)
+    db_utils.get_expenses_page(merchant_id, start_date, end_date, 0, db_utils.EXPENSE_PAGE_SIZE, "date.desc")
+    return summary["order_count"]
+
+def timed(stage, size, servers, func, *args):
+    """
+    Run one benchmark stage.
+
+    Returns:
+        Tuple of (result dict, value returned by func)
+    """
+    requests_before = [server.requests for server in servers]
+    started = time.perf_counter()
+    value = func(*args)
+    seconds = time.perf_counter() - started
+    requests = sum(server.requests for server in servers) - sum(requests_before)
+    return {"size": size, "stage": stage, "seconds": seconds, "requests": requests}, value
+
+def run_size(size, bulk, clover_latency, clover_offset_latency, db_latency, realistic_limits):
+    """Run every stage for one payment volume"""
+    merchant_id = f"BENCH{size}"
+    merchant = SyntheticMerchant(size, span_days=BENCH_SPAN_DAYS)
+    start_date = datetime.datetime.fromtimestamp(MOCK_START_MS / 1000) - datetime.timedelta(days=1)
+    end_date = datetime.datetime.fromtimestamp(merchant.end_ms / 1000) + datetime.timedelta(days=1)
+    results = []
+
+    with MockCloverServer({merchant_id: merchant}, latency=clover_latency,
+                          offset_latency=clover_offset_latency) as clover, \
+            MockPostgrestServer(latency=db_latency) as postgrest, \
+            tempfile.TemporaryDirectory(prefix="clover_archive_") as archive_dir:
+        configure(clover.base_url, postgrest.project_url, realistic_limits)
+        raw_archive.ARCHIVE_DIR = archive_dir
+        seed_database(postgrest, merchant_id)
+        servers = (clover, postgrest)
+
+        result, clover_data = timed("fetch_clover_data", size, servers, db_utils.fetch_clover_data,
+                                    merchant_id, BENCH_ACCESS_TOKEN, start_date, end_date,
+                                    db_utils.CLOVER_MAX_WORKERS, bulk)
+        result["rows"] = len(clover_data["payments"])
+        result["ok"] = result["rows"] == size
+        results.append(result)
+
+        result, saved = timed("process_and_save_clover_data", size, servers,
+                              db_utils.process_and_save_clover_data, merchant_id, clover_data)
+        result["rows"] = len(clover_data["payments"]) + len(clover_data["order_items"])
+        result["ok"] = saved
+        results.append(result)
+
+        # Every payment exists now, so this times the update path of the upsert
+        payments = db_utils.payments_frame(clover_data["payments"], merchant_id)
+        del clover_data
+        result, counts = timed("save_payments", size, servers, db_utils.save_payments, payments)
+        result["rows"] = len(payments)
+        result["ok"] = counts["failed"] == 0
+        results.append(result)
+        del payments
+        
+        # Rebuilds both tables from the pages fetch_clover_data archived, with no Clover requests
+        result, reprocessed = timed("reprocess_clover_archive", size, servers, db_utils.reprocess_clover_archive,
+                                    merchant_id)
+        result["rows"] = reprocessed["payments"] + reprocessed["order_items"]
+        result["ok"] = reprocessed["success"] and reprocessed["payments"] == size
+        results.append(result)
+
+        with db_utils._cache_lock:
+            db_utils._cache.clear()
+        result, order_count = timed("dashboard_load", size, servers, load_dashboard,
+                                    merchant_id, start_date, end_date)
+        result["rows"] = order_count
+        result["ok"] = order_count == size
+        results.append(result)
+
+        result, order_count = timed("dashboard_load_cached", size, servers, load_dashboard,
+                                    merchant_id, start_date, end_date)
+        result["rows"] = order_count
+        results.append(result)
+
+    for result in results:
+        result["rows_per_second"] = result["rows"] / result["seconds"] if result["seconds"] else None
+    return results
+
+def print_results(results, regressions=()):
+    """Print results as an aligned table"""
+    flagged = {(r["size"], r["stage"]) for r in regressions}
+    print(f"{'size':>9}  {'stage':<30} {'seconds':>9} {'rows/s':>11} {'requests':>9}")
+    for r in results:
+        rate = f"{r['rows_per_second']:,.0f}" if r["rows_per_second"] else "-"
+        note = ""
+        if r.get("ok") is False:
+            note = "  FAILED"
+        elif (r["size"], r["stage"]) in flagged:
+            note = "  REGRESSION"
+        print(f"{r['size']:>9,}  {r['stage']:<30} {r['seconds']:>9.3f} {rate:>11} {r['requests']:>9,}{note}")
+
+def find_regressions(results, baseline, tolerance):
+    """Stages slower than their baseline time by more than tolerance (a fraction)"""
+    previous = {(r["size"], r["stage"]): r for r in baseline}
+    regressions = []
+    for r in results:
+        before = previous.get((r["size"], r["stage"]))
+        if before and r["seconds"] > before["seconds"] * (1 + tolerance):
+            regressions.append(r)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the sync and dashboard data paths against local mocks")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated payment counts")
+    parser.add_argument("--mode", choices=("bulk", "payments"), default="bulk",
+                        help="Fetch orders with expanded line items (bulk) or payments plus per-order line items")
+    parser.add_argument("--clover-latency", type=float, default=0.0, help="Seconds added to each Clover request")
+    parser.add_argument("--clover-offset-latency", type=float, default=0.0,
+                        help="Seconds added to a Clover request per 1000 rows of offset")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="Seconds added to each Supabase request")
+    parser.add_argument("--realistic-limits", action="store_true", help="Keep Clover's 16 requests/second limits")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Compare with results saved by an earlier --json run")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown against the baseline, e.g. 0.25 for 25%%")
+    args = parser.parse_args(argv)
+
+    # Streamlit calls outside `streamlit run` only log noise
+    streamlit.logger.set_log_level("error")
+
+    results = []
+    for size in (int(value) for value in args.sizes.split(",") if value):
+        results.extend(run_size(size, args.mode == "bulk", args.clover_latency, args.clover_offset_latency,
+                                args.db_latency, args.realistic_limits))
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f)["results"], args.tolerance)
+
+    print_results(results, regressions)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"mode": args.mode, "clover_latency": args.clover_latency,
+                       "clover_offset_latency": args.clover_offset_latency, "db_latency": args.db_latency,
+                       "results": results}, f, indent=2)
+
+    if regressions:
+        print(f"\n{len(regressions)} stage(s) slower than the baseline by more than {args.tolerance:.0%}")
+    failed = any(r.get("ok") is False for r in results)
+    return 1 if regressions or failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
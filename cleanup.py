@@ -28,6 +28,11 @@ def cleanup_project():
     essential_files = [
         "app.py",
         "cloud_db_utils.py",
+        "clover_client.py",
+        "local_cache.py",
+        "sync_worker.py",
+        "raw_archive.py",
+        "clover_archive",
         "requirements.txt",
         "README.md",
         "deploy_to_streamlit_cloud.md",
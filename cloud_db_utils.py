@@ -5,16 +5,133 @@ It's a drop-in replacement for db_utils.py but uses Supabase instead of SQLite.
 """
 
 import pandas as pd
+import numpy as np
 import datetime
 import streamlit as st
 import os
 import time
 import json
+import copy
+import functools
+import threading
+import queue
 import requests
+from urllib.parse import quote
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from clover_client import CloverClient, CLOVER_MAX_CONCURRENT
+import raw_archive
+
+# Supabase HTTP settings
+SUPABASE_TIMEOUT = (5, 30)  # (connect, read) seconds
+SUPABASE_POOL_SIZE = 20
+SUPABASE_MAX_RETRIES = 3
+SUPABASE_PAGE_SIZE = 1000  # Matches the default PostgREST max-rows on Supabase
+
+# Bulk upsert settings
+UPSERT_INITIAL_BATCH = 500
+UPSERT_MIN_BATCH = 50
+UPSERT_MAX_BATCH = 5000
+UPSERT_MAX_PAYLOAD_BYTES = 2_000_000
+UPSERT_TARGET_SECONDS = 2.0  # Grow batches while requests finish faster than this
+UPSERT_PARALLEL_BATCHES = 4
+UPSERT_ID_LOOKUP_CHUNK = 200  # Keeps id=in.(...) lookups well under URL length limits
+
+# payments and order_items are partitioned by month on created_at, so their
+# unique key has to include it. Rows are still matched by id alone (see
+# _upsert_batch), searching this far either side of a batch's times
+SALES_CONFLICT_KEY = "id,created_at"
+SALES_KEY_LOOKUP_MARGIN = datetime.timedelta(days=2)  # Wider than any two timezones' offset
+SALES_KEY_MAX_OFFSET = datetime.timedelta(hours=26)  # Widest gap between two UTC offsets (-12:00 to +14:00)
+SALES_KEY_OFFSET_STEP = datetime.timedelta(minutes=15)  # UTC offsets are whole quarter hours
+
+# Clover API settings
+CLOVER_MAX_WORKERS = CLOVER_MAX_CONCURRENT  # Line item requests in flight per merchant
+SYNC_MAX_STORES = 4  # Stores synced at the same time
+STREAM_QUEUE_SIZE = 4  # Pages buffered between streaming sync stages
+ARCHIVE_BATCH_SIZE = 50000  # Archived records saved at a time when reprocessing; big batches let upserts ramp up
+
+# Dashboard read cache TTLs in seconds, per table
+CACHE_TTLS = {
+    "stores": 600,
+    "sync_log": 60,
+    "payments": 300,
+    "order_items": 300,
+    "expenses": 300
+}
+CLOVER_PAGE_LIMIT = 1000  # Maximum page size allowed by Clover API
+
+# Epoch millisecond spans used when converting Clover times to local time
+DAY_MS = 86_400_000
+QUARTER_HOUR_MS = 900_000  # UTC offsets only ever change on a quarter hour
+
+# Time-sliced fetch settings: one store's range is cut into windows paged by
+# several workers at once, and a window with many pages hands its remainder
+# to new, smaller windows
+CLOVER_FETCH_SLICES = CLOVER_MAX_CONCURRENT  # Windows fetched at the same time per store
+CLOVER_SLICE_PAGES = 4  # Full pages read from a window before its remainder is split
+CLOVER_MIN_SLICE = datetime.timedelta(minutes=1)  # Shorter windows are paged to the end, never split
+
+# Incremental sync settings
+SYNC_DEFAULT_DAYS = 30  # Window used when a store has no high-water mark
+SYNC_OVERLAP_MINUTES = 15  # Re-read this much before the high-water mark
+
+# Background sync jobs, run by sync_worker.py
+SYNC_JOB_KINDS = ("incremental", "full_resync")
+SYNC_JOB_HEARTBEAT_SECONDS = 15  # How often a running job reports its progress
+SYNC_JOB_STALE_MINUTES = 10  # Running jobs silent for this long are requeued
+
+# Orders fetched again per backfill_order_item_times batch
+ITEM_BACKFILL_BATCH = 500
+
+# Expense table paging
+EXPENSE_PAGE_SIZE = 25
+EXPENSE_SORT_COLUMNS = {"date", "amount", "category", "created_at"}
+
+# Shared across Streamlit reruns and sessions so connections stay warm
+_supabase_client = None
+_supabase_session = None
+_supabase_lock = threading.Lock()
+
+# Months whose payments/order_items partitions this process has already ensured
+_known_partitions = set()
+_partitions_lock = threading.Lock()
+
+def get_supabase_session():
+    """Get the shared pooled HTTP session used for all Supabase REST calls"""
+    global _supabase_session
+    if _supabase_session is None:
+        with _supabase_lock:
+            if _supabase_session is None:
+                retry = Retry(
+                    total=SUPABASE_MAX_RETRIES,
+                    backoff_factor=0.5,
+                    status_forcelist=[429, 502, 503, 504],
+                    respect_retry_after_header=True,
+                    raise_on_status=False
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=SUPABASE_POOL_SIZE,
+                    pool_maxsize=SUPABASE_POOL_SIZE,
+                    max_retries=retry
+                )
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _supabase_session = session
+    return _supabase_session
+
+def supabase_request(method, url, **kwargs):
+    """Send a request to Supabase through the shared session with a default timeout"""
+    kwargs.setdefault("timeout", SUPABASE_TIMEOUT)
+    return get_supabase_session().request(method, url, **kwargs)
 
 def get_supabase_client():
     """Get Supabase connection details from secrets"""
-    if not hasattr(st.session_state, "supabase_client"):
+    global _supabase_client
+    if _supabase_client is None:
         try:
             # Get connection details from secrets
             if hasattr(st, 'secrets') and 'connections' in st.secrets and 'supabase' in st.secrets.connections:
@@ -47,21 +164,30 @@ api_key = "your_anon_key"
                 "Prefer": "return=representation"
             }
             
-            st.session_state.supabase_client = {
-                "project_url": project_url,
-                "headers": headers
-            }
-            
             # Test connection to make sure it works
             test_url = f"{project_url}/rest/v1/sync_log?limit=1"
-            response = requests.get(test_url, headers=headers, timeout=10)
+            response = supabase_request("GET", test_url, headers=headers, timeout=10)
             response.raise_for_status()
             
+            _supabase_client = {
+                "project_url": project_url,
+                "headers": headers
+            }
+            
         except Exception as e:
             st.error(f"Failed to initialize Supabase client: {str(e)}")
             raise
     
-    return st.session_state.supabase_client
+    return _supabase_client
+
+# Failed reads seen by each thread, so cached() can tell a read's error
+# fallback (None or an empty frame) apart from a real empty result
+_read_failures = threading.local()
+
+def _record_read_failure(message):
+    """Show a failed read's error and keep its fallback result out of the read cache"""
+    _read_failures.count = getattr(_read_failures, "count", 0) + 1
+    st.error(message)
 
 def execute_query(query, params=None):
     """Execute a REST query against Supabase"""
@@ -69,20 +195,71 @@ def execute_query(query, params=None):
     url = f"{client['project_url']}/rest/v1/{query}"
     
     try:
-        response = requests.get(url, headers=client["headers"], params=params)
+        response = supabase_request("GET", url, headers=client["headers"], params=params)
         response.raise_for_status()  # Raise exception for HTTP errors
         return response.json()
     except Exception as e:
-        st.error(f"Database error: {str(e)}")
+        _record_read_failure(f"Database error: {str(e)}")
         return None
 
+def iter_query_pages(query, page_size=SUPABASE_PAGE_SIZE, order_by=("created_at", "id")):
+    """
+    Yield pages of rows for a REST query using keyset pagination.
+    
+    Pages are ordered on the (timestamp, id) pair in order_by and each request
+    resumes after the last row seen, so results are never silently capped by
+    PostgREST's max-rows setting and only one page is held in memory at a time.
+    
+    Args:
+        query: REST query such as "payments?merchant_id=eq.123" (without order/limit)
+        page_size: Rows requested per page
+        order_by: (timestamp column, unique id column) used as the cursor
+        
+    Yields:
+        Lists of row dicts
+        
+    Raises:
+        RuntimeError: If a page can't be read, so a failed request is never
+            mistaken for the end of the data
+    """
+    ts_col, id_col = order_by
+    separator = "&" if "?" in query else "?"
+    base_query = f"{query}{separator}order={ts_col}.asc,{id_col}.asc&limit={page_size}"
+    cursor = None
+    
+    while True:
+        page_query = base_query
+        if cursor is not None:
+            # Quote the cursor values so timestamps with "+" or ":" survive the URL
+            last_ts, last_id = (quote(f'"{value}"', safe='') for value in cursor)
+            page_query += f"&or=({ts_col}.gt.{last_ts},and({ts_col}.eq.{last_ts},{id_col}.gt.{last_id}))"
+        
+        rows = execute_query(page_query)
+        if rows is None:
+            raise RuntimeError(f"Could not read {query.split('?')[0]} from the database")
+        
+        # Stop on an empty page rather than a short one, since the server
+        # may cap pages below page_size
+        if not rows:
+            return
+        
+        yield rows
+        cursor = (rows[-1][ts_col], rows[-1][id_col])
+
+def read_query_frame(query, page_size=SUPABASE_PAGE_SIZE, order_by=("created_at", "id")):
+    """Read every page of a REST query into a single DataFrame, raising RuntimeError if a page fails"""
+    frames = [pd.DataFrame(rows) for rows in iter_query_pages(query, page_size, order_by)]
+    if frames:
+        return pd.concat(frames, ignore_index=True)
+    return pd.DataFrame()
+
 def execute_post(endpoint, data):
     """Execute a POST request against Supabase"""
     client = get_supabase_client()
     url = f"{client['project_url']}/rest/v1/{endpoint}"
     
     try:
-        response = requests.post(url, headers=client["headers"], json=data)
+        response = supabase_request("POST", url, headers=client["headers"], json=data)
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -97,7 +274,7 @@ def execute_update(endpoint, data, id_value):
     try:
         # Add the prefer header to return the updated record
         headers = {**client["headers"], "Prefer": "return=representation"}
-        response = requests.patch(url, headers=headers, json=data)
+        response = supabase_request("PATCH", url, headers=headers, json=data)
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -111,13 +288,106 @@ def execute_delete(endpoint, id_value):
     
     try:
         headers = {**client["headers"], "Prefer": "return=representation"}
-        response = requests.delete(url, headers=headers)
+        response = supabase_request("DELETE", url, headers=headers)
         response.raise_for_status()
         return True
     except Exception as e:
         st.error(f"Database error: {str(e)}")
         return False
 
+def _error_code(response):
+    """Get the PostgREST error code from a failed response, if it has one"""
+    if response.ok:
+        return None
+    try:
+        return response.json().get("code")
+    except (ValueError, AttributeError):
+        return None
+
+# Returned by execute_rpc when the database function isn't installed, so
+# callers can tell "use the fallback" apart from a failed call (None)
+RPC_MISSING = object()
+
+def execute_rpc(function_name, params=None):
+    """
+    Call a Postgres function through the Supabase REST RPC endpoint.
+    
+    Returns:
+        The decoded result, RPC_MISSING if the function isn't installed, or
+        None if the call failed
+    """
+    client = get_supabase_client()
+    url = f"{client['project_url']}/rest/v1/rpc/{function_name}"
+    
+    try:
+        response = supabase_request("POST", url, headers=client["headers"], json=params or {})
+        
+        # Function not installed yet (PostgREST answers 404 / PGRST202) - let
+        # callers fall back to client-side logic
+        if response.status_code == 404 or _error_code(response) == "PGRST202":
+            return RPC_MISSING
+        
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        _record_read_failure(f"Database error: {str(e)}")
+        return None
+
+# Read cache shared by every dashboard session in this process
+_cache = {}
+_cache_lock = threading.Lock()
+
+def cached(table):
+    """
+    Cache a read function's results per (function, arguments) for the table's TTL.
+    
+    The first positional argument is treated as the merchant/store ID so writes
+    can invalidate just that store's entries. Callers get a copy, so mutating a
+    returned DataFrame does not touch the cached one. Results of calls that
+    hit a failed read are returned but not cached, and expired entries are
+    dropped whenever a new one is stored.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (table, func.__name__, args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            
+            with _cache_lock:
+                entry = _cache.get(key)
+            if entry and entry[0] > now:
+                return copy.deepcopy(entry[1])
+            
+            failures = getattr(_read_failures, "count", 0)
+            result = func(*args, **kwargs)
+            if getattr(_read_failures, "count", 0) != failures:
+                return result
+            
+            with _cache_lock:
+                for expired in [k for k, (expires, _) in _cache.items() if expires <= now]:
+                    del _cache[expired]
+                _cache[key] = (now + CACHE_TTLS.get(table, 300), result)
+            return copy.deepcopy(result)
+        return wrapper
+    return decorator
+
+def invalidate_cache(table, merchant_ids=None):
+    """
+    Drop cached reads for a table.
+    
+    Args:
+        table: Table whose cached reads should be dropped
+        merchant_ids: Optional merchant/store IDs to limit invalidation to
+    """
+    with _cache_lock:
+        for key in list(_cache):
+            cached_table, _, args, _ = key
+            if cached_table != table:
+                continue
+            if merchant_ids is None or (args and args[0] in merchant_ids):
+                del _cache[key]
+
+@cached("stores")
 def get_all_stores():
     """Get all stores from Supabase."""
     try:
@@ -126,7 +396,7 @@ def get_all_stores():
             return pd.DataFrame(results)
         return pd.DataFrame()
     except Exception as e:
-        st.error(f"Error fetching stores: {str(e)}")
+        _record_read_failure(f"Error fetching stores: {str(e)}")
         return pd.DataFrame()
 
 def get_store_by_merchant_id(merchant_id):
@@ -144,9 +414,11 @@ def update_store_last_sync(merchant_id, sync_date=None):
     store = get_store_by_merchant_id(merchant_id)
     if store:
         execute_update("stores", {"last_sync_date": sync_date}, store["id"])
+        invalidate_cache("stores")
         return True
     return False
 
+@cached("payments")
 def get_payments_by_merchant(merchant_id, start_date=None, end_date=None):
     """Get payments for a merchant with optional date range"""
     query = f"payments?merchant_id=eq.{merchant_id}"
@@ -157,11 +429,10 @@ def get_payments_by_merchant(merchant_id, start_date=None, end_date=None):
         end_iso = end_date.isoformat() if isinstance(end_date, datetime.datetime) else end_date
         query += f"&created_at=gte.{start_iso}&created_at=lte.{end_iso}"
     
-    results = execute_query(query)
-    if results:
-        return pd.DataFrame(results)
-    return pd.DataFrame()
+    # Page through the full range instead of stopping at the max-rows cap
+    return read_query_frame(query)
 
+@cached("payments")
 def get_payments_count_by_merchant(merchant_id, start_date=None, end_date=None):
     """Get count of payments for a merchant with optional date range"""
     query = f"payments?merchant_id=eq.{merchant_id}&select=id"
@@ -177,39 +448,397 @@ def get_payments_count_by_merchant(merchant_id, start_date=None, end_date=None):
     
     try:
         headers = {**client["headers"], "Prefer": "count=exact"}
-        response = requests.get(url, headers=headers)
+        response = supabase_request("GET", url, headers=headers)
+        response.raise_for_status()
         
         if "content-range" in response.headers:
             count = response.headers["content-range"].split("/")[1]
             return int(count)
         return 0
     except Exception as e:
-        st.error(f"Error getting payment count: {str(e)}")
+        _record_read_failure(f"Error getting payment count: {str(e)}")
         return 0
 
-def save_payments(payments_data):
-    """Save multiple payments to the database"""
-    if not payments_data or len(payments_data) == 0:
-        return 0
+# pandas frequencies for the dashboard's time buckets
+BUCKET_FREQUENCIES = {"hour": "H", "day": "D", "month": "MS"}
+
+def _bucket_start(timestamp, bucket):
+    """Floor a timestamp to the start of its bucket"""
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert("UTC").tz_localize(None)
+    if bucket == "month":
+        return timestamp.to_period("M").to_timestamp()
+    return timestamp.floor(BUCKET_FREQUENCIES[bucket])
+
+def build_sales_series(frame, start_date=None, end_date=None, bucket="day", time_column="created_at",
+                       sales_column="amount", count_column=None):
+    """
+    Bucket sales into a chronological, zero-filled time series.
+    
+    Rows are resampled on a datetime index with native sum/count
+    aggregations, then reindexed over every bucket in the range so gaps show
+    up as zero instead of disappearing.
+    
+    Args:
+        frame: DataFrame of payments or of pre-aggregated buckets
+        start_date: First bucket to include, or None to start at the first row
+        end_date: Last bucket to include, or None to end at the last row
+        bucket: Time bucket - 'hour', 'day' or 'month'
+        time_column: Column holding each row's timestamp
+        sales_column: Column summed into total_sales (units are kept as is)
+        count_column: Column summed into order_count, or None to count rows
+        
+    Returns:
+        DataFrame with bucket, total_sales and order_count columns in time order
+    """
+    freq = BUCKET_FREQUENCIES[bucket]
+    
+    if frame.empty:
+        series = pd.DataFrame({"total_sales": pd.Series(dtype="float64"),
+                               "order_count": pd.Series(dtype="int64")},
+                              index=pd.DatetimeIndex([]))
+    else:
+        index = pd.DatetimeIndex(pd.to_datetime(frame[time_column], utc=True).dt.tz_localize(None))
+        columns = [sales_column] + ([count_column] if count_column else [])
+        resampled = frame[columns].set_index(index).resample(freq)
+        series = pd.DataFrame({
+            "total_sales": resampled[sales_column].sum(),
+            "order_count": resampled[count_column].sum() if count_column else resampled[sales_column].count()
+        })
+    
+    # Fill every bucket in the range, not just the ones with sales
+    first = _bucket_start(start_date, bucket) if start_date is not None else (series.index.min() if len(series) else None)
+    last = _bucket_start(end_date, bucket) if end_date is not None else (series.index.max() if len(series) else None)
+    if first is not None and last is not None:
+        series = series.reindex(pd.date_range(first, last, freq=freq), fill_value=0)
+    
+    series.index.name = "bucket"
+    series = series.reset_index()
+    series["order_count"] = series["order_count"].astype("int64")
+    return series
+
+def _summarize_payments(payments_df, bucket):
+    """Aggregate raw payment rows into time buckets (fallback for get_sales_summary)"""
+    series = build_sales_series(payments_df, bucket=bucket)
+    series["total_sales"] = series["total_sales"] / 100  # Convert cents to dollars
+    return series
+
+@cached("payments")
+def get_sales_summary(merchant_id, start_date, end_date, bucket="day"):
+    """
+    Get sales totals and a per-bucket series for a merchant, aggregated in Postgres.
+    
+    Args:
+        merchant_id: The Clover merchant ID
+        start_date: Start of the range
+        end_date: End of the range
+        bucket: Time bucket for the series - 'hour', 'day' or 'month'
+        
+    Returns:
+        Dict with total_sales (dollars), order_count and a series DataFrame
+        with bucket, total_sales and order_count columns
+    """
+    start_iso = start_date.isoformat() if isinstance(start_date, datetime.datetime) else start_date
+    end_iso = end_date.isoformat() if isinstance(end_date, datetime.datetime) else end_date
+    
+    results = execute_rpc("get_sales_summary", {
+        "p_merchant_id": merchant_id,
+        "p_start": start_iso,
+        "p_end": end_iso,
+        "p_bucket": bucket
+    })
+    
+    if results is None:
+        # Not a missing function, so downloading every payment wouldn't help
+        raise RuntimeError("Could not load the sales summary from the database")
+    
+    if results is not RPC_MISSING:
+        series = pd.DataFrame(results, columns=["bucket", "total_amount", "payment_count"])
+        series = series.rename(columns={"payment_count": "order_count"})
+        series["bucket"] = pd.to_datetime(series["bucket"])
+        series["total_sales"] = series.pop("total_amount").astype(float) / 100  # Convert cents to dollars
+        series = series[["bucket", "total_sales", "order_count"]]
+    else:
+        # Database function not installed - aggregate the raw rows locally
+        series = _summarize_payments(get_payments_by_merchant(merchant_id, start_date, end_date), bucket)
+    
+    return {
+        "total_sales": float(series["total_sales"].sum()),
+        "order_count": int(series["order_count"].sum()),
+        "series": series
+    }
+
+def _conflict_keys(frame, key_columns):
+    """Build the set of comparable keys in a frame, normalizing created_at to naive UTC"""
+    columns = []
+    for col in key_columns:
+        if col == "created_at":
+            # Postgres returns timestamps with an offset; rows are written naive (read as UTC)
+            values = pd.to_datetime(frame[col], utc=True).dt.tz_localize(None)
+        else:
+            values = frame[col].astype(str)
+        columns.append(values.tolist())
+    return set(zip(*columns))
+
+def _created_at(rows):
+    """Get the created_at values from row dicts or a DataFrame as timestamps"""
+    if isinstance(rows, pd.DataFrame):
+        values = rows["created_at"] if "created_at" in rows else pd.Series(dtype=object)
+    else:
+        values = pd.Series([row.get('created_at') for row in rows], dtype=object)
+    return pd.to_datetime(values.dropna())
+
+def _upsert_batch(client, table, batch, payload, on_conflict):
+    """
+    Upsert one batch and work out how many rows were new.
     
-    # Convert payments to list of dicts if it's a DataFrame
-    if isinstance(payments_data, pd.DataFrame):
-        payments_list = payments_data.to_dict('records')
+    Runs on a worker thread, so it raises instead of reporting through Streamlit.
+    
+    Args:
+        client: Supabase client details
+        table: Table name
+        batch: DataFrame of rows in the batch
+        payload: The batch serialized as a JSON array
+        on_conflict: Column(s) identifying an existing row
+    
+    Returns:
+        Tuple of (inserted count, updated count, elapsed seconds)
+    """
+    started = time.monotonic()
+    base_url = f"{client['project_url']}/rest/v1/{table}"
+    
+    # Look up which keys already exist so the counts are exact even though
+    # the upsert itself returns nothing
+    key_columns = on_conflict.split(",")
+    by_id = "created_at" in key_columns
+    
+    # Bounding the lookup by created_at lets Postgres prune to the batch's partitions
+    time_filter = ""
+    if by_id:
+        created = _created_at(batch)
+        time_filter = (f"&created_at=gte.{quote((created.min() - SALES_KEY_LOOKUP_MARGIN).isoformat())}"
+                       f"&created_at=lte.{quote((created.max() + SALES_KEY_LOOKUP_MARGIN).isoformat())}")
+    
+    ids = batch["id"].drop_duplicates().tolist()
+    found = []
+    for i in range(0, len(ids), UPSERT_ID_LOOKUP_CHUNK):
+        chunk = ids[i:i+UPSERT_ID_LOOKUP_CHUNK]
+        id_list = ",".join(quote(f'"{row_id}"', safe='') for row_id in chunk)
+        response = supabase_request("GET", f"{base_url}?select={on_conflict}&id=in.({id_list}){time_filter}",
+                                    headers=client["headers"])
+        response.raise_for_status()
+        found.extend(response.json())
+    
+    stale = pd.DataFrame(columns=["id", "created_at"])
+    if by_id:
+        # created_at depends on the timezone of the host that synced the row,
+        # so the same record can arrive shifted by a UTC offset. Such rows
+        # keep the created_at already stored and update in place. Any other
+        # difference is a corrected timestamp: the row is written under its
+        # new created_at and its old copies are deleted after the upsert
+        stored = pd.DataFrame(found, columns=["id", "created_at"])
+        stored["id"] = stored["id"].astype(str)
+        stored["created_at"] = pd.to_datetime(stored["created_at"], utc=True).dt.tz_localize(None)
+        incoming = pd.Series(pd.to_datetime(batch["created_at"]).values, index=batch["id"].astype(str))
+        incoming = incoming[~incoming.index.duplicated(keep="last")]
+        
+        shift = stored["created_at"] - stored["id"].map(incoming)
+        exact = stored["id"].isin(stored.loc[shift == pd.Timedelta(0), "id"])
+        offset = ((shift != pd.Timedelta(0)) & (shift.abs() <= SALES_KEY_MAX_OFFSET)
+                  & (shift % SALES_KEY_OFFSET_STEP == pd.Timedelta(0)))
+        rekey = stored[offset & ~exact].drop_duplicates("id").set_index("id")["created_at"]
+        if not rekey.empty:
+            batch = batch.copy()
+            matched = batch["id"].astype(str).map(rekey)
+            batch.loc[matched.notna(), "created_at"] = matched[matched.notna()]
+            batch = batch.drop_duplicates(subset=key_columns, keep="last")
+            payload = batch.to_json(orient="records", date_format="iso")
+        
+        target = incoming.copy()
+        target.update(rekey)
+        stale = stored[stored["created_at"] != stored["id"].map(target)]
+        existing = int(batch["id"].astype(str).drop_duplicates().isin(stored["id"]).sum())
     else:
-        payments_list = payments_data
+        keys = _conflict_keys(batch, key_columns)
+        existing = len(_conflict_keys(pd.DataFrame(found), key_columns) & keys) if found else 0
+    
+    headers = {**client["headers"], "Prefer": "resolution=merge-duplicates,return=minimal"}
+    response = supabase_request("POST", f"{base_url}?on_conflict={on_conflict}", headers=headers, data=payload)
+    response.raise_for_status()
+    
+    # Remove the old copies of moved rows only once their new copy is written
+    pairs = []
+    for row_id, created_at in zip(stale["id"], stale["created_at"]):
+        row_id = quote(f'"{row_id}"', safe='')
+        pairs.append(f"and(id.eq.{row_id},created_at.eq.{quote(created_at.isoformat())})")
+    for i in range(0, len(pairs), UPSERT_ID_LOOKUP_CHUNK):
+        response = supabase_request("DELETE", f"{base_url}?or=({','.join(pairs[i:i+UPSERT_ID_LOOKUP_CHUNK])})",
+                                    headers=client["headers"])
+        response.raise_for_status()
+    
+    return len(batch) - existing, existing, time.monotonic() - started
+
+def upsert_rows(table, rows, on_conflict="id", max_parallel=UPSERT_PARALLEL_BATCHES):
+    """
+    Upsert rows in large adaptive batches with several batches in flight.
+    
+    Rows whose key already exists are merged instead of failing the batch, so
+    re-syncing an overlapping window is idempotent. Batch size grows while
+    requests finish under UPSERT_TARGET_SECONDS, shrinks when they are slower,
+    and is capped so a request body stays under UPSERT_MAX_PAYLOAD_BYTES.
+    
+    Args:
+        table: Table name
+        rows: DataFrame or list of row dicts, all with the same keys
+        on_conflict: Column(s) identifying an existing row
+        max_parallel: Maximum batches in flight at once
+        
+    Returns:
+        Dict with inserted, updated and failed row counts
+    """
+    counts = {"inserted": 0, "updated": 0, "failed": 0}
+    if len(rows) == 0:
+        return counts
+    
+    # Work on columns so batches serialize without a Python call per row;
+    # object dtype keeps list values exactly as given (no int -> float upcasts)
+    if not isinstance(rows, pd.DataFrame):
+        rows = pd.DataFrame(rows, dtype=object)
+    
+    # A batch may not touch the same key twice, so keep the last copy of each row
+    key_columns = on_conflict.split(",")
+    rows = rows.drop_duplicates(subset=key_columns, keep="last")
+    
+    client = get_supabase_client()
+    
+    # Estimate row size from a sample to keep payloads bounded
+    sample = rows.iloc[:UPSERT_MIN_BATCH]
+    row_bytes = max(1, len(sample.to_json(orient="records", date_format="iso")) // len(sample))
+    max_batch = max(UPSERT_MIN_BATCH, min(UPSERT_MAX_BATCH, UPSERT_MAX_PAYLOAD_BYTES // row_bytes))
+    batch_size = min(UPSERT_INITIAL_BATCH, max_batch)
+    
+    errors = []
+    position = 0
+    in_flight = {}
+    
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as executor:
+        while position < len(rows) or in_flight:
+            # Keep the pipeline full
+            while position < len(rows) and len(in_flight) < max_parallel:
+                batch = rows.iloc[position:position+batch_size]
+                position += len(batch)
+                payload = batch.to_json(orient="records", date_format="iso")
+                future = executor.submit(_upsert_batch, client, table, batch, payload, on_conflict)
+                in_flight[future] = len(batch)
+            
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                size = in_flight.pop(future)
+                try:
+                    inserted, updated, elapsed = future.result()
+                    counts["inserted"] += inserted
+                    counts["updated"] += updated
+                    
+                    # Adapt the next batches to the observed latency
+                    if elapsed < UPSERT_TARGET_SECONDS / 2:
+                        batch_size = min(max_batch, batch_size * 2)
+                    elif elapsed > UPSERT_TARGET_SECONDS:
+                        batch_size = max(UPSERT_MIN_BATCH, batch_size // 2)
+                except Exception as e:
+                    counts["failed"] += size
+                    errors.append(str(e))
+                    batch_size = max(UPSERT_MIN_BATCH, batch_size // 2)
+    
+    for error in errors:
+        st.error(f"Database error saving {table}: {error}")
+    
+    # Drop cached reads for the merchants just written
+    if "merchant_id" in rows:
+        invalidate_cache(table, set(rows["merchant_id"].dropna()))
+    
+    return counts
+
+def ensure_sales_partitions(rows):
+    """
+    Make sure the monthly payments/order_items partitions for some rows exist.
+    
+    Months already ensured by this process (or by a database without the
+    function) are skipped, so steady-state syncs make no extra calls.
+    
+    Args:
+        rows: DataFrame or row dicts with a created_at value
+    """
+    created = _created_at(rows)
+    months = {f"{month // 100:04d}-{month % 100:02d}"
+              for month in (created.dt.year * 100 + created.dt.month).unique()}
+    with _partitions_lock:
+        months -= _known_partitions
+    if not months:
+        return
+    
+    # One call covers every month between the earliest and latest new month
+    result = execute_rpc("ensure_sales_partitions", {
+        "p_start": f"{min(months)}-01T00:00:00",
+        "p_end": f"{max(months)}-01T00:00:00"
+    })
+    if result is None:
+        # Leave the months unrecorded so the next save tries again
+        return
+    
+    with _partitions_lock:
+        _known_partitions.update(months)
+
+def purge_store_history(merchant_id, start_date, end_date):
+    """
+    Remove a store's payments, order items and rollup rows in a date range.
+    
+    Used before a full reload. Whole monthly partitions holding only this
+    store's rows are truncated instead of deleted row by row.
+    
+    Args:
+        merchant_id: Merchant ID for the store
+        start_date: Start of the range to clear
+        end_date: End of the range to clear
+        
+    Returns:
+        True if the range was cleared, False otherwise
+    """
+    try:
+        client = get_supabase_client()
+        response = supabase_request(
+            "POST",
+            f"{client['project_url']}/rest/v1/rpc/purge_merchant_history",
+            headers=client["headers"],
+            json={
+                "p_merchant_id": merchant_id,
+                "p_start": start_date.isoformat() if isinstance(start_date, datetime.datetime) else start_date,
+                "p_end": end_date.isoformat() if isinstance(end_date, datetime.datetime) else end_date
+            }
+        )
+        response.raise_for_status()
+    except Exception as e:
+        st.error(f"Error clearing history for store {merchant_id}: {str(e)}")
+        return False
     
-    # Insert in batches of 50
-    batch_size = 50
-    success_count = 0
+    for table in ("payments", "order_items"):
+        invalidate_cache(table, {merchant_id})
+    return True
+
+def save_payments(payments_data):
+    """
+    Upsert multiple payments to the database.
     
-    for i in range(0, len(payments_list), batch_size):
-        batch = payments_list[i:i+batch_size]
-        result = execute_post("payments", batch)
-        if result:
-            success_count += len(result)
+    Returns:
+        Dict with inserted, updated and failed row counts
+    """
+    if payments_data is None or len(payments_data) == 0:
+        return {"inserted": 0, "updated": 0, "failed": 0}
     
-    return success_count
+    ensure_sales_partitions(payments_data)
+    return upsert_rows("payments", payments_data, on_conflict=SALES_CONFLICT_KEY)
 
+@cached("order_items")
 def get_order_items_by_merchant(merchant_id, start_date=None, end_date=None):
     """Get order items for a merchant with optional date range"""
     query = f"order_items?merchant_id=eq.{merchant_id}"
@@ -219,50 +848,183 @@ def get_order_items_by_merchant(merchant_id, start_date=None, end_date=None):
         end_iso = end_date.isoformat() if isinstance(end_date, datetime.datetime) else end_date
         query += f"&created_at=gte.{start_iso}&created_at=lte.{end_iso}"
     
-    results = execute_query(query)
-    if results:
-        return pd.DataFrame(results)
-    return pd.DataFrame()
+    # Page through the full range instead of stopping at the max-rows cap
+    return read_query_frame(query)
 
 def save_order_items(items_data):
-    """Save multiple order items to the database"""
-    if not items_data or len(items_data) == 0:
+    """
+    Upsert multiple order items to the database.
+    
+    Returns:
+        Dict with inserted, updated and failed row counts
+    """
+    if items_data is None or len(items_data) == 0:
+        return {"inserted": 0, "updated": 0, "failed": 0}
+    
+    ensure_sales_partitions(items_data)
+    return upsert_rows("order_items", items_data, on_conflict=SALES_CONFLICT_KEY)
+
+def backfill_order_item_times(store, batch_size=ITEM_BACKFILL_BATCH, max_workers=CLOVER_MAX_WORKERS, progress=None):
+    """
+    Repair order items that were stamped with the time of the sync.
+    
+    Earlier syncs set created_at to when the item was saved rather than when
+    it was sold. Orders with items timestamped after their first payment are
+    read from the database one batch at a time, fetched again from Clover
+    and given the created_at a sync would write now. Stale copies of items
+    that have since been re-synced are dropped at the same time. Items
+    Clover gives no timestamp are left as they are.
+    
+    Args:
+        store: Store record with merchant_id and optional access_token
+        batch_size: Orders repaired per batch
+        max_workers: Maximum number of Clover requests in flight at once
+        progress: Optional callback receiving the running total after each batch
+        
+    Returns:
+        Number of rows repaired or removed
+    """
+    merchant_id = store['merchant_id']
+    access_token = get_store_access_token(store)
+    if not access_token:
+        st.warning(f"No access token found for store {store.get('name', merchant_id)}")
         return 0
     
-    # Convert to list of dicts if it's a DataFrame
-    if isinstance(items_data, pd.DataFrame):
-        items_list = items_data.to_dict('records')
-    else:
-        items_list = items_data
+    client = CloverClient(merchant_id, access_token)
     
-    # Insert in batches of 50
-    batch_size = 50
-    success_count = 0
+    def fetch_items(order_id):
+        order = client.get(f"orders/{order_id}", {"expand": "lineItems"}) or {}
+        items = (order.get('lineItems') or {}).get('elements', [])
+        for item in items:
+            item['orderId'] = order_id
+            item['orderCreatedTime'] = order.get('createdTime')
+        return items
     
-    for i in range(0, len(items_list), batch_size):
-        batch = items_list[i:i+batch_size]
-        result = execute_post("order_items", batch)
-        if result:
-            success_count += len(result)
+    total = 0
+    after_order_id = None
+    while True:
+        # Orders are walked in id order, so items that really were added
+        # after a payment are only fetched once
+        order_ids = execute_rpc("stale_order_item_orders", {
+            "p_merchant_id": merchant_id,
+            "p_after_order_id": after_order_id,
+            "p_limit": batch_size
+        })
+        if not order_ids or order_ids is RPC_MISSING:
+            break
+        after_order_id = order_ids[-1]
+        
+        items = []
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {executor.submit(fetch_items, order_id): order_id for order_id in order_ids}
+            for future in as_completed(futures):
+                try:
+                    items.extend(future.result())
+                except Exception as e:
+                    st.error(f"Error fetching order {futures[future]} from Clover API: {str(e)}")
+                    return total
+        
+        frame = order_items_frame(items, merchant_id)
+        if frame.empty:
+            continue
+        
+        ensure_sales_partitions(frame)
+        times = dict(zip(frame['id'], np.datetime_as_string(frame['created_at'].to_numpy(dtype="datetime64[us]"),
+                                                            unit='us')))
+        repaired = execute_rpc("set_order_item_times", {"p_merchant_id": merchant_id, "p_times": times})
+        if repaired is None or repaired is RPC_MISSING:
+            break
+        
+        total += repaired
+        if progress:
+            progress(total)
     
-    return success_count
+    if total:
+        invalidate_cache("order_items", {merchant_id})
+    return total
+
+def _expense_range_filter(start_date, end_date):
+    """Build the date filter shared by the expense queries"""
+    if not (start_date and end_date):
+        return ""
+    start_str = start_date.strftime("%Y-%m-%d") if isinstance(start_date, datetime.datetime) else start_date
+    end_str = end_date.strftime("%Y-%m-%d") if isinstance(end_date, datetime.datetime) else end_date
+    return f"&date=gte.{start_str}&date=lte.{end_str}"
 
-def get_expenses_by_store(store_id, start_date=None, end_date=None):
-    """Get expenses for a store with optional date range"""
-    query = f"expenses?store_id=eq.{store_id}"
+@cached("expenses")
+def get_expenses_page(store_id, start_date=None, end_date=None, offset=0, limit=EXPENSE_PAGE_SIZE, sort="date.desc"):
+    """
+    Get one page of a store's expenses, sorted by the database.
     
-    if start_date and end_date:
-        start_str = start_date.strftime("%Y-%m-%d") if isinstance(start_date, datetime.datetime) else start_date
-        end_str = end_date.strftime("%Y-%m-%d") if isinstance(end_date, datetime.datetime) else end_date
-        query += f"&date=gte.{start_str}&date=lte.{end_str}"
+    Args:
+        store_id: Store ID
+        start_date: Optional start of the date range
+        end_date: Optional end of the date range
+        offset: Number of rows to skip
+        limit: Maximum rows to return
+        sort: Column and direction, e.g. "date.desc" or "amount.asc"
+        
+    Returns:
+        Dict with the page's rows as a DataFrame and the total_count of
+        expenses matching the filter
+    """
+    column, _, direction = sort.partition(".")
+    if column not in EXPENSE_SORT_COLUMNS or direction not in ("asc", "desc"):
+        column, direction = "date", "desc"
     
-    # Add order by date descending
-    query += "&order=date.desc"
+    # The id tiebreaker keeps rows from shifting between pages
+    query = (f"expenses?store_id=eq.{store_id}{_expense_range_filter(start_date, end_date)}"
+             f"&order={column}.{direction},id.{direction}")
     
-    results = execute_query(query)
-    if results:
-        return pd.DataFrame(results)
-    return pd.DataFrame()
+    client = get_supabase_client()
+    url = f"{client['project_url']}/rest/v1/{query}"
+    
+    try:
+        headers = {
+            **client["headers"],
+            "Prefer": "count=exact",
+            "Range-Unit": "items",
+            "Range": f"{offset}-{offset + limit - 1}"
+        }
+        response = supabase_request("GET", url, headers=headers)
+        
+        # Asking for a page past the end is not an error, just an empty page
+        if response.status_code == 416:
+            rows = []
+        else:
+            response.raise_for_status()
+            rows = response.json()
+        
+        total_count = 0
+        if "content-range" in response.headers:
+            total = response.headers["content-range"].split("/")[1]
+            total_count = int(total) if total.isdigit() else 0
+        
+        return {"rows": pd.DataFrame(rows), "total_count": total_count}
+    except Exception as e:
+        _record_read_failure(f"Error getting expenses: {str(e)}")
+        return {"rows": pd.DataFrame(), "total_count": 0}
+
+@cached("expenses")
+def get_expense_total(store_id, start_date=None, end_date=None):
+    """Get the total amount of a store's expenses with optional date range"""
+    start_str = start_date.strftime("%Y-%m-%d") if isinstance(start_date, datetime.datetime) else start_date
+    end_str = end_date.strftime("%Y-%m-%d") if isinstance(end_date, datetime.datetime) else end_date
+    
+    result = execute_rpc("get_expense_total", {
+        "p_store_id": store_id,
+        "p_start": start_str,
+        "p_end": end_str
+    })
+    if result is None:
+        raise RuntimeError("Could not load the expense total from the database")
+    if result is not RPC_MISSING:
+        return float(result or 0)
+    
+    # Database function not installed - add up the amounts locally
+    query = f"expenses?store_id=eq.{store_id}&select=id,amount,created_at{_expense_range_filter(start_date, end_date)}"
+    amounts = read_query_frame(query)
+    return float(amounts["amount"].sum()) if not amounts.empty else 0.0
 
 def add_expense(store_id, date, amount, category, description):
     """Add a new expense"""
@@ -277,6 +1039,7 @@ def add_expense(store_id, date, amount, category, description):
     }
     
     result = execute_post("expenses", expense_data)
+    invalidate_cache("expenses", {store_id})
     return result is not None
 
 def update_expense(expense_id, data):
@@ -285,11 +1048,16 @@ def update_expense(expense_id, data):
     data["updated_at"] = datetime.datetime.now().isoformat()
     
     result = execute_update("expenses", data, expense_id)
+    
+    # The expense's store isn't known here, so drop every cached expense read
+    invalidate_cache("expenses")
     return result is not None
 
 def delete_expense(expense_id):
     """Delete an expense"""
-    return execute_delete("expenses", expense_id)
+    result = execute_delete("expenses", expense_id)
+    invalidate_cache("expenses")
+    return result
 
 def add_sync_log(status, details=None):
     """Add a sync log entry"""
@@ -302,8 +1070,10 @@ def add_sync_log(status, details=None):
         log_data["details"] = details if isinstance(details, str) else json.dumps(details)
     
     result = execute_post("sync_log", log_data)
+    invalidate_cache("sync_log")
     return result is not None
 
+@cached("sync_log")
 def get_last_sync():
     """Get the last sync log entry"""
     results = execute_query("sync_log?order=sync_time.desc&limit=1")
@@ -316,95 +1086,650 @@ def get_expense_categories():
     return ["Rent", "Utilities", "Salaries", "Inventory", "Marketing", "Insurance", "Taxes", "Maintenance", "Supplies", "Other"]
 
 # Clover API Integration Functions
-def fetch_clover_data(merchant_id, access_token, start_date, end_date):
+def date_to_ms(date_obj):
+    """Convert datetime object to milliseconds timestamp"""
+    return int(date_obj.timestamp() * 1000)
+
+def _naive_time(value):
     """
-    Fetch payment data from Clover API for a specific merchant and date range.
+    Read a time stored in the database as a naive local datetime.
     
     Args:
-        merchant_id: The Clover merchant ID
-        access_token: The Clover access token
-        start_date: Start date for data retrieval
-        end_date: End date for data retrieval
+        value: ISO format string or datetime read back from Postgres
         
     Returns:
-        Dictionary containing payments and order data
+        Naive datetime in local time
     """
-    # Format dates for Clover API
-    start_str = start_date.strftime("%Y-%m-%dT00:00:00.000Z")
-    end_str = end_date.strftime("%Y-%m-%dT23:59:59.999Z")
-    
-    # Base URL for Clover API
-    base_url = "https://api.clover.com/v3"
-    
-    # Headers for authorization
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Content-Type': 'application/json'
-    }
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value)
+    # Times are written as naive local times, so drop the offset Postgres adds
+    return value.replace(tzinfo=None)
+
+def _script_thread_pool(max_workers):
+    """Thread pool whose workers can still write to the current Streamlit page"""
+    ctx = get_script_run_ctx()
+    return ThreadPoolExecutor(max_workers=max(1, max_workers), initializer=add_script_run_ctx, initargs=(None, ctx))
+
+def _put_until_stopped(target_queue, item, stop):
+    """
+    Put an item on a bounded queue, giving up once the other side has stopped.
     
-    # Fetch payments
-    payments_url = f"{base_url}/merchants/{merchant_id}/payments"
-    params = {
-        'filter': f'createdTime>={start_str} and createdTime<={end_str}',
-        'expand': 'order',
-        'limit': 1000  # Maximum allowed by Clover API
-    }
+    Args:
+        target_queue: Queue to put the item on
+        item: Item to put
+        stop: Event set when the consumer has stopped, so a producer never
+            blocks forever on a full queue
+        
+    Returns:
+        True if the item was queued, False if stop was set first
+    """
+    while not stop.is_set():
+        try:
+            target_queue.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def fetch_order_line_items(client, order_ids, max_workers=CLOVER_MAX_WORKERS, order_times=None):
+    """
+    Fetch line items for many orders concurrently using a bounded worker pool.
     
-    all_payments = []
-    has_more = True
-    offset = 0
+    Args:
+        client: CloverClient for the merchant
+        order_ids: Iterable of Clover order IDs
+        max_workers: Maximum number of requests in flight at once
+        order_times: Optional dict of order ID -> order createdTime, stamped
+            on each item as orderCreatedTime
+        
+    Returns:
+        Tuple of (line items list, dict of order ID -> error message)
+    """
+    order_times = order_times or {}
     
-    # Paginate through all results
-    while has_more:
-        params['offset'] = offset
-        try:
-            response = requests.get(payments_url, headers=headers, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            if 'elements' in data:
-                payments = data['elements']
-                all_payments.extend(payments)
-                
-                # Check if there are more pages
-                if len(payments) < 1000:
-                    has_more = False
-                else:
-                    offset += 1000
-            else:
-                has_more = False
-        except Exception as e:
-            st.error(f"Error fetching payments from Clover API: {str(e)}")
-            break
+    def fetch_items(order_id):
+        data = client.get(f"orders/{order_id}/line_items")
+        items = data.get('elements', []) if data else []
+        for item in items:
+            item['orderId'] = order_id
+            item['orderCreatedTime'] = order_times.get(order_id)
+        return items
     
-    # Get order items for all orders
     order_items = []
-    order_ids = set()
+    errors = {}
     
-    # Extract unique order IDs from payments
-    for payment in all_payments:
-        if 'order' in payment and payment['order'] and 'id' in payment['order']:
-            order_ids.add(payment['order']['id'])
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {executor.submit(fetch_items, order_id): order_id for order_id in order_ids}
+        for future in as_completed(futures):
+            order_id = futures[future]
+            try:
+                order_items.extend(future.result())
+            except Exception as e:
+                errors[order_id] = str(e)
     
-    # Fetch line items for each order
-    for order_id in order_ids:
-        try:
-            items_url = f"{base_url}/merchants/{merchant_id}/orders/{order_id}/line_items"
-            response = requests.get(items_url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
+    return order_items, errors
+
+def _iter_clover_records(client, resource, start_date, end_date, time_field, expand):
+    """
+    Yield pages of raw Clover records in a time range using a (time_field, id) cursor.
+    
+    Pages are read oldest first and each request starts at the last time
+    already seen instead of at a growing offset, so a deep page costs the
+    same as the first and records created during the scan can't shift the
+    ones still to come. Records at the cursor time that were already read
+    are dropped by id. Paging stops on a short page.
+    
+    Args:
+        client: CloverClient for the merchant
+        resource: Endpoint under the merchant, e.g. "payments"
+        start_date: Start of the range
+        end_date: End of the range
+        time_field: Clover field to filter and order on - createdTime or modifiedTime
+        expand: Clover expand parameter
+        
+    Yields:
+        Tuples of (records not yielded before, resume_time), where resume_time
+        is the page's last time_field value when more pages follow, else None
+        
+    Raises:
+        RuntimeError: If a page can't be fetched, so a failed request is never
+            mistaken for the end of the range
+    """
+    cursor = date_to_ms(start_date)
+    end_ms = date_to_ms(end_date)
+    boundary_ids = set()  # Records at the cursor time already read
+    skip = 0  # Offset past the cursor time's records once whole pages share it
+    
+    while True:
+        params = {
+            'filter': [f"{time_field}>={cursor}", f"{time_field}<={end_ms}"],
+            'expand': expand,
+            'orderBy': f'{time_field} ASC',
+            'limit': CLOVER_PAGE_LIMIT
+        }
+        if skip:
+            params['offset'] = skip
+        try:
+            data = client.get(resource, params)
+        except Exception as e:
+            raise RuntimeError(f"Error fetching {resource} from Clover API: {str(e)}") from e
+        
+        page = data.get('elements', []) if data else []
+        records = [record for record in page
+                   if not (record.get(time_field) == cursor and record.get('id') in boundary_ids)]
+        full = len(page) >= CLOVER_PAGE_LIMIT
+        yield records, page[-1].get(time_field) if full else None
+        
+        if not full:
+            return
+        
+        last_time = page[-1].get(time_field)
+        if last_time is not None and last_time > cursor:
+            cursor, skip = last_time, 0
+            boundary_ids = {record.get('id') for record in page if record.get(time_field) == last_time}
+        else:
+            # A whole page shares the cursor time, so restarting there would
+            # return it again - step over the records read so far instead
+            boundary_ids |= {record.get('id') for record in page}
+            skip = len(boundary_ids)
+
+def _page_edges(edge_times, resume_time):
+    """Start the edges map of a page: window edge or resume time -> ids of records read at it"""
+    return {edge: {'payments': set(), 'order_items': set()}
+            for edge in edge_times | ({resume_time} if resume_time is not None else set())}
+
+def _iter_order_pages(client, start_date, end_date, time_field):
+    """Yield raw data one page of orders at a time, with line items and payments expanded"""
+    edge_times = {date_to_ms(start_date), date_to_ms(end_date)}
+    for orders, resume_time in _iter_clover_records(client, "orders", start_date, end_date, time_field,
+                                                     'lineItems,payments'):
+        page = {'payments': [], 'order_items': [], 'resume_time': resume_time,
+                'edges': _page_edges(edge_times, resume_time)}
+        for order in orders:
+            order_id = order.get('id')
+            edge = page['edges'].get(order.get(time_field))
+            
+            # Payments and line items are nested under the order, so tag each
+            # one with its order the same way the per-order fetch does
+            for payment in (order.get('payments') or {}).get('elements', []):
+                if not payment.get('order'):
+                    payment['order'] = {'id': order_id}
+                page['payments'].append(payment)
+                if edge is not None:
+                    edge['payments'].add(payment.get('id'))
             
-            if 'elements' in data:
-                for item in data['elements']:
-                    item['orderId'] = order_id
-                    order_items.append(item)
+            for item in (order.get('lineItems') or {}).get('elements', []):
+                item['orderId'] = order_id
+                item['orderCreatedTime'] = order.get('createdTime')
+                page['order_items'].append(item)
+                if edge is not None:
+                    edge['order_items'].add(item.get('id'))
+        
+        yield page
+
+def _iter_payment_pages(client, start_date, end_date, time_field, max_workers):
+    """Yield raw data one page of payments at a time, with line items for the page's new orders"""
+    edge_times = {date_to_ms(start_date), date_to_ms(end_date)}
+    previous_orders = set()
+    
+    for payments, resume_time in _iter_clover_records(client, "payments", start_date, end_date, time_field,
+                                                      'order'):
+        # Only fetch line items for orders not already seen on the previous
+        # page, where an order's other payments usually are; an order paid
+        # again much later has its items fetched again and merged on upsert.
+        # Items inherit the order's createdTime, or the first payment's when
+        # the order wasn't expanded
+        edges = _page_edges(edge_times, resume_time)
+        order_times = {}
+        order_edges = {}
+        for payment in payments:
+            edge = edges.get(payment.get(time_field))
+            if edge is not None:
+                edge['payments'].add(payment.get('id'))
+            if 'order' in payment and payment['order'] and 'id' in payment['order']:
+                order_id = payment['order']['id']
+                order_times.setdefault(order_id, payment['order'].get('createdTime') or payment.get('createdTime'))
+                if edge is not None:
+                    order_edges.setdefault(order_id, []).append(edge)
+        order_ids = set(order_times) - previous_orders
+        previous_orders = set(order_times)
+        
+        # Fetch line items for the page's orders with a bounded worker pool
+        order_items, item_errors = fetch_order_line_items(client, order_ids, max_workers, order_times)
+        if item_errors:
+            details = "; ".join(f"order {order_id}: {error}"
+                                for order_id, error in sorted(item_errors.items()))
+            raise RuntimeError(f"Error fetching order items for {len(item_errors)} orders ({details})")
+        
+        for item in order_items:
+            for edge in order_edges.get(item['orderId'], []):
+                edge['order_items'].add(item.get('id'))
+        
+        yield {'payments': payments, 'order_items': order_items, 'resume_time': resume_time, 'edges': edges}
+
+def _iter_window_pages(client, window, bulk, time_field, max_workers):
+    """
+    Yield raw Clover data for one (start, end) time window, paging it serially.
+    
+    Every page is tagged with its window, and the window's last page (the
+    one with no resume_time) is yielded even when empty so callers can tell
+    the window was read to the end.
+    """
+    start_date, end_date = window
+    if bulk:
+        pages = _iter_order_pages(client, start_date, end_date, time_field)
+    else:
+        pages = _iter_payment_pages(client, start_date, end_date, time_field, max_workers)
+    for page in pages:
+        page['window'] = window
+        yield page
+
+def _split_window(start_date, end_date, parts):
+    """Cut a window into parts; neighbours share their boundary so no record falls between them"""
+    step = (end_date - start_date) / parts
+    bounds = [start_date + step * i for i in range(parts)] + [end_date]
+    return list(zip(bounds, bounds[1:]))
+
+class _WindowBoundaries:
+    """
+    Ids of records read at the boundaries of windows still being fetched.
+    
+    Neighbouring windows both read the records whose time is their shared
+    boundary, so those are the only records that can arrive twice. A
+    boundary's ids are kept while any window touching it is open and
+    dropped once the last one finishes, so memory stays bounded by the
+    records at open boundaries instead of growing with the range.
+    """
+    
+    def __init__(self):
+        self.boundaries = {}  # boundary ms -> [open windows, payment ids, item ids]
+        self.resume_edges = {}  # window -> (resume_time, edge ids) of its latest full page
+    
+    def open(self, window):
+        for boundary in {date_to_ms(window[0]), date_to_ms(window[1])}:
+            self.boundaries.setdefault(boundary, [0, set(), set()])[0] += 1
+    
+    def close(self, window):
+        self.resume_edges.pop(window, None)
+        for boundary in {date_to_ms(window[0]), date_to_ms(window[1])}:
+            entry = self.boundaries.get(boundary)
+            if entry:
+                entry[0] -= 1
+                if entry[0] <= 0:
+                    del self.boundaries[boundary]
+    
+    def split(self, window, new_windows):
+        """Replace a window by its split remainder, carrying over the records read at the split time"""
+        for new_window in new_windows:
+            self.open(new_window)
+        resume_time, edge = self.resume_edges.get(window, (None, None))
+        entry = self.boundaries.get(date_to_ms(new_windows[0][0]))
+        if edge and entry and resume_time == date_to_ms(new_windows[0][0]):
+            entry[1] |= edge['payments']
+            entry[2] |= edge['order_items']
+        self.close(window)
+    
+    def first_seen(self, page):
+        """Drop a page's records already read at a boundary, e.g. by a neighbouring window"""
+        repeated = {'payments': set(), 'order_items': set()}
+        for edge_time, edge in page.get('edges', {}).items():
+            entry = self.boundaries.get(edge_time)
+            if entry is None:
+                continue
+            repeated['payments'] |= edge['payments'] & entry[1]
+            repeated['order_items'] |= edge['order_items'] & entry[2]
+            entry[1] |= edge['payments']
+            entry[2] |= edge['order_items']
+        for kind, ids in repeated.items():
+            if ids:
+                page[kind] = [record for record in page[kind] if record.get('id') not in ids]
+        
+        # Remember the records at the resume time in case the window splits there
+        window, resume_time = page.get('window'), page.get('resume_time')
+        if resume_time is not None:
+            edge = page.get('edges', {}).get(resume_time, {'payments': set(), 'order_items': set()})
+            previous_time, previous = self.resume_edges.get(window, (None, None))
+            if previous_time == resume_time:
+                edge = {kind: previous[kind] | edge[kind] for kind in edge}
+            self.resume_edges[window] = (resume_time, edge)
+
+def _iter_sliced_pages(client, windows, bulk, time_field, max_workers, slices):
+    """
+    Yield raw Clover data for time windows fetched several at once.
+    
+    Each window is paged by its own worker. Once a window has returned
+    CLOVER_SLICE_PAGES full pages, its unread remainder is split into
+    `slices` new windows, so a short range costs the same requests as a
+    serial fetch while a long one keeps every worker busy. Windows overlap
+    on their boundaries, and records read at a boundary are de-duplicated
+    by id while a window touching it is still open.
+    
+    A split is announced by an empty page whose `split` lists the new
+    windows, after every page the old window produced.
+    """
+    if not windows:
+        return
+    
+    done = object()
+    pages = queue.Queue(maxsize=slices * 2)
+    stop = threading.Event()
+    lock = threading.Lock()
+    outstanding = [0]
+    errors = []
+    executor = _script_thread_pool(slices)
+    
+    def submit(new_windows):
+        # Count every window before starting any, so one finishing early can't
+        # look like the last
+        with lock:
+            outstanding[0] += len(new_windows)
+        for window in new_windows:
+            executor.submit(fetch_window, *window)
+    
+    def fetch_window(window_start, window_end):
+        try:
+            full_pages = 0
+            for page in _iter_window_pages(client, (window_start, window_end), bulk, time_field, max_workers):
+                if not _put_until_stopped(pages, page, stop):
+                    return
+                if page['resume_time'] is None:
+                    continue
+                
+                # Pages run oldest first, so the remainder starts at the last record
+                # read; records sharing its time are read again and dropped by id
+                full_pages += 1
+                remainder_start = datetime.datetime.fromtimestamp(page['resume_time'] / 1000)
+                if full_pages >= CLOVER_SLICE_PAGES and window_end - remainder_start > CLOVER_MIN_SLICE:
+                    split = _split_window(remainder_start, window_end, slices)
+                    marker = {'payments': [], 'order_items': [], 'resume_time': None,
+                              'window': (window_start, window_end), 'split': split}
+                    if not _put_until_stopped(pages, marker, stop):
+                        return
+                    submit(split)
+                    return
         except Exception as e:
-            st.error(f"Error fetching order items for order {order_id}: {str(e)}")
+            errors.append(e)
+        finally:
+            with lock:
+                outstanding[0] -= 1
+                finished = outstanding[0] == 0
+            if finished:
+                _put_until_stopped(pages, done, stop)
     
-    return {
-        'payments': all_payments,
-        'order_items': order_items
-    }
+    boundaries = _WindowBoundaries()
+    for window in windows:
+        boundaries.open(window)
+    submit(windows)
+    try:
+        while True:
+            page = pages.get()
+            if page is done:
+                break
+            if page.get('split'):
+                boundaries.split(page['window'], page['split'])
+            else:
+                boundaries.first_seen(page)
+                if page['resume_time'] is None:
+                    boundaries.close(page['window'])
+            yield page
+    finally:
+        stop.set()
+        executor.shutdown(wait=True)
+    
+    if errors:
+        raise errors[0]
+
+def iter_clover_pages(merchant_id, access_token, start_date, end_date, bulk=False, time_field="createdTime",
+                      max_workers=CLOVER_MAX_WORKERS, slices=CLOVER_FETCH_SLICES, windows=None):
+    """
+    Yield raw Clover data for a merchant and date range one API page at a time.
+    
+    Args:
+        merchant_id: The Clover merchant ID
+        access_token: The Clover access token
+        start_date: Start date for data retrieval
+        end_date: End date for data retrieval
+        bulk: Page orders with line items expanded instead of fetching
+            line items one order at a time
+        time_field: Clover field to filter on - createdTime or modifiedTime
+        max_workers: Maximum concurrent line item requests
+        slices: Time windows fetched at the same time; 1 pages the range serially
+        windows: Optional (start, end) windows to fetch instead of the whole
+            range, e.g. the unfinished windows of an interrupted sync
+        
+    Yields:
+        Dicts with the page's payments and order_items, in no particular time
+        order, plus the window they came from and its resume_time cursor.
+        Each page is saved to the raw archive before it is yielded
+    """
+    if windows is None:
+        windows = [(start_date, end_date)]
+    elif not windows:
+        # e.g. a resumed sync whose windows had all finished
+        return
+    
+    client = CloverClient(merchant_id, access_token)
+    if slices > 1:
+        pages = _iter_sliced_pages(client, windows, bulk, time_field, max_workers, slices)
+    else:
+        pages = (page for window in windows
+                 for page in _iter_window_pages(client, window, bulk, time_field, max_workers))
+    
+    for page in pages:
+        if raw_archive.is_enabled() and (page['payments'] or page['order_items']):
+            try:
+                raw_archive.archive_page(merchant_id, page)
+            except OSError as e:
+                # The archive is only needed for reprocessing, so a full disk doesn't stop the sync
+                st.warning(f"Could not archive Clover page for merchant {merchant_id}: {str(e)}")
+        yield page
+
+def _collect_pages(pages):
+    """Gather streamed pages into a single payments/order_items dict"""
+    clover_data = {'payments': [], 'order_items': []}
+    for page in pages:
+        clover_data['payments'].extend(page['payments'])
+        clover_data['order_items'].extend(page['order_items'])
+    return clover_data
+
+def fetch_clover_orders(merchant_id, access_token, start_date, end_date, time_field="createdTime"):
+    """
+    Bulk fetch orders with their line items and payments already expanded.
+    
+    Pages the orders endpoint with a time filter so a whole window costs
+    one request per page instead of one request per order.
+    
+    Args:
+        merchant_id: The Clover merchant ID
+        access_token: The Clover access token
+        start_date: Start date for data retrieval
+        end_date: End date for data retrieval
+        time_field: Clover field to filter on - createdTime or modifiedTime
+        
+    Returns:
+        Dictionary containing payments and order data
+    """
+    return _collect_pages(iter_clover_pages(merchant_id, access_token, start_date, end_date, bulk=True,
+                                            time_field=time_field))
+
+def fetch_clover_data(merchant_id, access_token, start_date, end_date, max_workers=CLOVER_MAX_WORKERS, bulk=False,
+                      time_field="createdTime"):
+    """
+    Fetch payment data from Clover API for a specific merchant and date range.
+    
+    Holds the whole range in memory; use stream_clover_data for large syncs.
+    
+    Args:
+        merchant_id: The Clover merchant ID
+        access_token: The Clover access token
+        start_date: Start date for data retrieval
+        end_date: End date for data retrieval
+        max_workers: Maximum concurrent line item requests
+        bulk: Page orders with line items expanded instead of fetching
+            line items one order at a time (recommended for backfills)
+        time_field: Clover field to filter on - createdTime, or modifiedTime
+            to pick up records changed since a previous sync
+        
+    Returns:
+        Dictionary containing payments and order data
+    """
+    return _collect_pages(iter_clover_pages(merchant_id, access_token, start_date, end_date, bulk=bulk,
+                                            time_field=time_field, max_workers=max_workers))
+
+def _utc_offsets_ms(ms_values):
+    """Look up the local UTC offset, in milliseconds, at each epoch millisecond value"""
+    return np.array([
+        datetime.datetime.fromtimestamp(int(value) / 1000, datetime.timezone.utc).astimezone().utcoffset()
+        // datetime.timedelta(milliseconds=1)
+        for value in ms_values
+    ], dtype="int64")
+
+def ms_to_local_timestamps(ms_values):
+    """
+    Convert epoch milliseconds to naive local times in one vectorized pass.
+    
+    Matches datetime.fromtimestamp(ms / 1000) for every value. The local UTC
+    offset is looked up at the start and end of each day present in the
+    data; only days whose two offsets differ (a DST change) are looked up
+    again per quarter hour, since offsets only change on quarter hours.
+    
+    Args:
+        ms_values: Array-like of epoch milliseconds
+        
+    Returns:
+        numpy datetime64[ms] array of naive local times
+    """
+    ms = np.asarray(ms_values, dtype="int64")
+    days, inverse = np.unique(ms // DAY_MS, return_inverse=True)
+    day_starts = _utc_offsets_ms(days * DAY_MS)
+    day_ends = _utc_offsets_ms(days * DAY_MS + DAY_MS - 1)
+    offsets = day_starts[inverse]
+    
+    changed = (day_starts != day_ends)[inverse]
+    if changed.any():
+        quarter_hours, quarter_inverse = np.unique(ms[changed] // QUARTER_HOUR_MS, return_inverse=True)
+        offsets[changed] = _utc_offsets_ms(quarter_hours * QUARTER_HOUR_MS)[quarter_inverse]
+    
+    return (ms + offsets).astype("datetime64[ms]")
+
+def _field(records, key, default=None):
+    """Pull one field out of a list of raw Clover dicts"""
+    return [record.get(key, default) for record in records]
+
+def _number_field(records, key):
+    """Pull one numeric field out of a list of raw Clover dicts, with NaN for missing values"""
+    return np.array(_field(records, key), dtype="float64")
+
+def payments_frame(payments, store_id):
+    """
+    Normalize a page of raw Clover payments into payments table columns.
+    
+    Each field is pulled out in a single pass and converted as a whole
+    column, so no per-payment datetime or dict work is done.
+    
+    Args:
+        payments: Raw Clover payment dicts
+        store_id: Merchant ID for the store
+        
+    Returns:
+        DataFrame with id, merchant_id, order_id, amount (cents) and
+        created_at (naive datetime) columns
+    """
+    ids = _field(payments, 'id')
+    amounts = _number_field(payments, 'amount')
+    created_time = np.nan_to_num(_number_field(payments, 'createdTime')).astype("int64")
+    
+    frame = pd.DataFrame({
+        'id': ids,
+        'merchant_id': store_id,
+        'order_id': _field([payment.get('order') or {} for payment in payments], 'id'),
+        'amount': amounts,
+        'created_at': ms_to_local_timestamps(created_time)
+    })
+    
+    # Skip payments missing an id, amount or timestamp
+    valid = np.array([bool(payment_id) for payment_id in ids], dtype=bool) & ~np.isnan(amounts) & (created_time != 0)
+    if not valid.all():
+        frame = frame[valid].reset_index(drop=True)
+    
+    frame['amount'] = frame['amount'].astype("int64")
+    return frame
+
+def order_items_frame(items, store_id):
+    """
+    Normalize a page of raw Clover line items into order_items table columns.
+    
+    Items are timestamped with their own createdTime, falling back to the
+    createdTime of the order (or its payment) they were fetched with. Items
+    with neither are skipped.
+    
+    Args:
+        items: Raw Clover line item dicts tagged with their orderId and orderCreatedTime
+        store_id: Merchant ID for the store
+        
+    Returns:
+        DataFrame with id, merchant_id, order_id, name, price (dollars),
+        quantity and created_at (naive datetime) columns
+    """
+    ids = _field(items, 'id')
+    order_ids = _field(items, 'orderId')
+    created_time = _number_field(items, 'createdTime')
+    created_time = np.where(np.nan_to_num(created_time) == 0, _number_field(items, 'orderCreatedTime'), created_time)
+    created_time = np.nan_to_num(created_time).astype("int64")
+    
+    frame = pd.DataFrame({
+        'id': ids,
+        'merchant_id': store_id,
+        'order_id': order_ids,
+        'name': _field(items, 'name'),
+        'price': np.nan_to_num(_number_field(items, 'price')) / 100,  # Convert cents to dollars
+        'quantity': pd.array(_field(items, 'quantity', 1), dtype="Int64"),
+        'created_at': ms_to_local_timestamps(created_time)
+    })
+    
+    # Skip items missing an id, order or timestamp. created_at is part of the
+    # partitioned table's key, so an item stamped with the time of the sync
+    # would be stored again under its real time once Clover gives one
+    valid = np.array([bool(item_id) and bool(order_id) for item_id, order_id in zip(ids, order_ids)], dtype=bool)
+    valid &= created_time != 0
+    if not valid.all():
+        frame = frame[valid].reset_index(drop=True)
+    
+    return frame
+
+def refresh_daily_sales(merchant_id, payments_rows):
+    """
+    Recompute the daily_sales rollup buckets touched by newly saved payments.
+    
+    Args:
+        merchant_id: Merchant the payments belong to
+        payments_rows: Transformed payments rows or frame (with created_at) just written
+        
+    Returns:
+        Number of rollup rows rebuilt, or None if nothing was refreshed
+    """
+    created = _created_at(payments_rows)
+    if created.empty:
+        return None
+    
+    result = execute_rpc("refresh_daily_sales", {
+        "p_merchant_id": merchant_id,
+        "p_start": created.min().isoformat(),
+        "p_end": created.max().isoformat()
+    })
+    
+    # Dashboard summaries are cached under payments and read from the rollup
+    invalidate_cache("payments", {merchant_id})
+    return None if result is RPC_MISSING else result
+
+def _sync_log_message(payments_saved, items_saved):
+    """Summarize upsert counts for the sync log"""
+    return (
+        f"Synced {payments_saved['inserted'] + payments_saved['updated']} payments "
+        f"({payments_saved['inserted']} new, {payments_saved['updated']} updated) and "
+        f"{items_saved['inserted'] + items_saved['updated']} order items "
+        f"({items_saved['inserted']} new, {items_saved['updated']} updated)"
+    )
 
 def process_and_save_clover_data(store_id, clover_data):
     """
@@ -418,62 +1743,18 @@ def process_and_save_clover_data(store_id, clover_data):
         True if successful, False otherwise
     """
     try:
-        # Process payments
-        payments_processed = []
-        for payment in clover_data['payments']:
-            # Extract payment data
-            payment_id = payment.get('id')
-            order_id = payment.get('order', {}).get('id')
-            amount = payment.get('amount')
-            created_time = payment.get('createdTime')
-            
-            if payment_id and amount is not None and created_time:
-                # Convert timestamp to datetime
-                created_at = datetime.datetime.fromtimestamp(created_time / 1000)
-                
-                # Format for Supabase
-                payment_data = {
-                    'id': payment_id,
-                    'merchant_id': store_id,
-                    'order_id': order_id,
-                    'amount': amount,
-                    'created_at': created_at.isoformat()
-                }
-                payments_processed.append(payment_data)
-        
-        # Process order items
-        items_processed = []
-        for item in clover_data['order_items']:
-            item_id = item.get('id')
-            order_id = item.get('orderId')
-            name = item.get('name')
-            price = item.get('price')
-            quantity = item.get('quantity', 1)
-            
-            if item_id and order_id:
-                # Format for Supabase
-                item_data = {
-                    'id': item_id,
-                    'merchant_id': store_id,
-                    'order_id': order_id,
-                    'name': name,
-                    'price': price / 100 if price else 0,  # Convert cents to dollars
-                    'quantity': quantity,
-                    'created_at': datetime.datetime.now().isoformat()  # Use current time as fallback
-                }
-                items_processed.append(item_data)
+        payments_processed = payments_frame(clover_data['payments'], store_id)
+        items_processed = order_items_frame(clover_data['order_items'], store_id)
         
         # Save to Supabase
-        payments_saved = 0
-        if payments_processed:
-            payments_saved = save_payments(payments_processed)
+        payments_saved = save_payments(payments_processed)
+        items_saved = save_order_items(items_processed)
         
-        items_saved = 0
-        if items_processed:
-            items_saved = save_order_items(items_processed)
+        # Bring the daily_sales rollup up to date for the synced range
+        refresh_daily_sales(store_id, payments_processed)
         
         # Update sync log
-        add_sync_log("completed", f"Synced {payments_saved} payments and {items_saved} order items")
+        add_sync_log("completed", _sync_log_message(payments_saved, items_saved))
         
         return True
     
@@ -483,7 +1764,533 @@ def process_and_save_clover_data(store_id, clover_data):
         add_sync_log("failed", str(e))
         return False
 
-def sync_clover_data(store_id=None, start_date=None, end_date=None):
+def reprocess_clover_archive(store_id, start_date=None, end_date=None, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Rebuild a store's payments and order_items from the raw Clover archive.
+    
+    Reads the archived pages one day partition at a time and runs them
+    through the same transforms and upserts as a sync, without any Clover
+    API calls, so a transform change can be applied to history at local
+    disk speed.
+    
+    Args:
+        store_id: Merchant ID for the store
+        start_date: Optional first day to reprocess
+        end_date: Optional last day to reprocess
+        batch_size: Archived records transformed and saved at a time
+        
+    Returns:
+        Dict with success, message, days, payments and order_items
+    """
+    totals = {
+        "days": 0,
+        "payments": 0,
+        "order_items": 0,
+        "payments_saved": {"inserted": 0, "updated": 0, "failed": 0},
+        "items_saved": {"inserted": 0, "updated": 0, "failed": 0}
+    }
+    written_range = None
+    savers = {
+        "payments": (payments_frame, save_payments, "payments_saved"),
+        "order_items": (order_items_frame, save_order_items, "items_saved")
+    }
+    batches = {kind: [] for kind in savers}
+    
+    def flush(kind):
+        nonlocal written_range
+        to_frame, save, saved_key = savers[kind]
+        frame = to_frame(batches[kind], store_id)
+        for count, value in save(frame).items():
+            totals[saved_key][count] += value
+        totals[kind] += len(batches[kind])
+        batches[kind] = []
+        
+        if kind == "payments":
+            created = _created_at(frame)
+            if not created.empty:
+                batch_range = (created.min(), created.max())
+                written_range = (min(written_range[0], batch_range[0]), max(written_range[1], batch_range[1])) \
+                    if written_range else batch_range
+    
+    try:
+        # Days are small next to a batch, so batches fill across day partitions
+        for day in raw_archive.archived_days(store_id, start_date, end_date):
+            for kind in savers:
+                for record in raw_archive.iter_archived_records(store_id, kind, day):
+                    batches[kind].append(record)
+                    if len(batches[kind]) >= batch_size:
+                        flush(kind)
+            totals["days"] += 1
+        for kind in savers:
+            if batches[kind]:
+                flush(kind)
+        
+        # Bring the daily_sales rollup up to date for everything rewritten
+        if written_range:
+            refresh_daily_sales(store_id, pd.DataFrame({'created_at': list(written_range)}))
+        
+        message = f"Reprocessed {totals['days']} archived days: " + \
+            _sync_log_message(totals["payments_saved"], totals["items_saved"])
+        add_sync_log("completed", message)
+        return {"success": True, "message": message, **totals}
+    
+    except Exception as e:
+        error_message = f"Error reprocessing archived Clover data for store {store_id}: {str(e)}"
+        st.error(error_message)
+        add_sync_log("failed", error_message)
+        return {"success": False, "message": error_message, **totals}
+
+def _window_checkpoints(page):
+    """
+    Describe where a page leaves its window, as sync_checkpoints rows.
+    
+    Windows are keyed by their end: a resumed window keeps its end and moves
+    its start up to the cursor, and the last window of a split takes over
+    the end of the window it came from.
+    """
+    window_start, window_end = page['window']
+    if page.get('split'):
+        return [{"window_start": start, "window_end": end, "cursor_ms": None, "done": False}
+                for start, end in page['split']]
+    return [{
+        "window_start": window_start,
+        "window_end": window_end,
+        "cursor_ms": page['resume_time'],
+        "done": page['resume_time'] is None
+    }]
+
+def _run_stage(target, ctx, *args):
+    """Start a pipeline stage on a daemon thread attached to the Streamlit script"""
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    add_script_run_ctx(thread, ctx)
+    thread.start()
+    return thread
+
+def stream_clover_data(store_id, access_token, start_date, end_date, bulk=False, time_field="createdTime",
+                       max_workers=CLOVER_MAX_WORKERS, queue_size=STREAM_QUEUE_SIZE, windows=None,
+                       checkpoint_job=None, progress=None):
+    """
+    Fetch, transform and save Clover data page by page.
+    
+    The fetch and transform stages run on their own threads and hand pages on
+    through bounded queues, while the calling thread writes each transformed
+    page as soon as it arrives. Memory stays flat regardless of the date
+    range and the first rows land within one page of the sync starting.
+    
+    Args:
+        store_id: Merchant ID for the store
+        access_token: The Clover access token
+        start_date: Start date for data retrieval
+        end_date: End date for data retrieval
+        bulk: Page orders with line items expanded
+        time_field: Clover field to filter on - createdTime or modifiedTime
+        max_workers: Maximum concurrent line item requests
+        queue_size: Maximum pages buffered between stages
+        windows: Optional (start, end) windows to fetch instead of the whole range
+        checkpoint_job: Resumable sync to record each window's progress under
+            in sync_checkpoints once its page is written
+        progress: Optional callback called with (store_id, totals) after each
+            page is written
+        
+    Returns:
+        Dict with pages, payments and order_items fetched, the payments_saved
+        and items_saved upsert counts, and whether every window was read to
+        the end (complete)
+    """
+    done = object()
+    raw_pages = queue.Queue(maxsize=queue_size)
+    row_pages = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+    ctx = get_script_run_ctx()
+    
+    def take(source_queue):
+        # Treat a stopped pipeline like the end of the stream
+        while not stop.is_set():
+            try:
+                return source_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return done
+    
+    def fetch_stage():
+        try:
+            for page in iter_clover_pages(store_id, access_token, start_date, end_date, bulk=bulk,
+                                          time_field=time_field, max_workers=max_workers, windows=windows):
+                if not _put_until_stopped(raw_pages, page, stop):
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            _put_until_stopped(raw_pages, done, stop)
+    
+    def transform_stage():
+        try:
+            while True:
+                page = take(raw_pages)
+                if page is done:
+                    break
+                rows = {
+                    'raw_payments': len(page['payments']),
+                    'raw_order_items': len(page['order_items']),
+                    'payments': payments_frame(page['payments'], store_id),
+                    'order_items': order_items_frame(page['order_items'], store_id),
+                    'window_end': page['window'][1],
+                    'checkpoints': _window_checkpoints(page)
+                }
+                if not _put_until_stopped(row_pages, rows, stop):
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            _put_until_stopped(row_pages, done, stop)
+    
+    # Payments written so far, as (earliest, latest) created_at, for the rollup refresh
+    written_range = None
+    
+    # Ends of the windows not read to the end yet
+    open_windows = {window_end for _, window_end in (windows if windows is not None else [(start_date, end_date)])}
+    
+    # Ends of the windows with rows that failed to save
+    failed_windows = set()
+    
+    totals = {
+        "pages": 0,
+        "payments": 0,
+        "order_items": 0,
+        "payments_saved": {"inserted": 0, "updated": 0, "failed": 0},
+        "items_saved": {"inserted": 0, "updated": 0, "failed": 0}
+    }
+    
+    stages = [_run_stage(fetch_stage, ctx), _run_stage(transform_stage, ctx)]
+    try:
+        # Write stage
+        while True:
+            rows = take(row_pages)
+            if rows is done:
+                break
+            
+            page_failed = False
+            if rows['raw_payments'] or rows['raw_order_items']:
+                for key, saved in (("payments_saved", save_payments(rows['payments'])),
+                                   ("items_saved", save_order_items(rows['order_items']))):
+                    for count, value in saved.items():
+                        totals[key][count] += value
+                    page_failed = page_failed or saved['failed'] > 0
+                
+                totals["pages"] += 1
+                totals["payments"] += rows['raw_payments']
+                totals["order_items"] += rows['raw_order_items']
+                
+                created = _created_at(rows['payments'])
+                if not created.empty:
+                    page_range = (created.min(), created.max())
+                    written_range = (min(written_range[0], page_range[0]), max(written_range[1], page_range[1])) \
+                        if written_range else page_range
+            
+            # A window with rows that didn't save keeps its last good checkpoint and
+            # stays open, along with any windows split from it, so a resumed run
+            # reads those rows again
+            checkpoints = rows['checkpoints']
+            if page_failed or rows['window_end'] in failed_windows:
+                failed_windows.add(rows['window_end'])
+                failed_windows.update(checkpoint['window_end'] for checkpoint in checkpoints)
+                open_windows |= failed_windows
+                checkpoints = []
+            
+            # The page is written, so its window can resume after it
+            for checkpoint in checkpoints:
+                if checkpoint['done']:
+                    open_windows.discard(checkpoint['window_end'])
+                else:
+                    open_windows.add(checkpoint['window_end'])
+            if checkpoint_job and checkpoints:
+                save_sync_checkpoints(store_id, checkpoint_job, checkpoints)
+            if progress:
+                progress(store_id, totals)
+    finally:
+        stop.set()
+        for stage in stages:
+            stage.join()
+    
+    # Bring the daily_sales rollup up to date for everything written
+    if written_range:
+        refresh_daily_sales(store_id, pd.DataFrame({'created_at': list(written_range)}))
+    
+    if errors:
+        raise errors[0]
+    
+    totals["complete"] = not open_windows
+    return totals
+
+def sync_checkpoint_job(bulk, time_field, start_date):
+    """Name a resumable sync so a rerun from the same start finds its checkpoints"""
+    return f"{'orders' if bulk else 'payments'}:{time_field}:{start_date.isoformat()}"
+
+def get_sync_checkpoints(merchant_id, job):
+    """Get the saved window checkpoints of a resumable sync"""
+    results = execute_query(f"sync_checkpoints?merchant_id=eq.{merchant_id}&job=eq.{quote(job, safe='')}")
+    return results or []
+
+def save_sync_checkpoints(merchant_id, job, checkpoints):
+    """
+    Upsert the progress of a resumable sync's time windows.
+    
+    Args:
+        merchant_id: Merchant ID for the store
+        job: Name of the sync from sync_checkpoint_job
+        checkpoints: Dicts with window_start, window_end, cursor_ms (the
+            Clover time the window resumes from, or None for its start) and done
+        
+    Returns:
+        True if saved, False otherwise
+    """
+    if not checkpoints:
+        return True
+    
+    updated_at = datetime.datetime.now().isoformat()
+    rows = [
+        {
+            "merchant_id": merchant_id,
+            "job": job,
+            "window_start": checkpoint["window_start"].isoformat(),
+            "window_end": checkpoint["window_end"].isoformat(),
+            "cursor_ms": checkpoint["cursor_ms"],
+            "done": checkpoint["done"],
+            "updated_at": updated_at
+        }
+        for checkpoint in checkpoints
+    ]
+    
+    try:
+        client = get_supabase_client()
+        headers = {**client["headers"], "Prefer": "resolution=merge-duplicates,return=minimal"}
+        response = supabase_request("POST",
+                                    f"{client['project_url']}/rest/v1/sync_checkpoints?on_conflict=merchant_id,job,window_end",
+                                    headers=headers, json=rows)
+        response.raise_for_status()
+        return True
+    except Exception as e:
+        st.error(f"Error saving sync checkpoint for store {merchant_id}: {str(e)}")
+        return False
+
+def clear_sync_checkpoints(merchant_id, job):
+    """Delete a finished sync's checkpoints so the next run starts over"""
+    try:
+        client = get_supabase_client()
+        response = supabase_request("DELETE",
+                                    f"{client['project_url']}/rest/v1/sync_checkpoints"
+                                    f"?merchant_id=eq.{merchant_id}&job=eq.{quote(job, safe='')}",
+                                    headers=client["headers"])
+        response.raise_for_status()
+        return True
+    except Exception as e:
+        st.error(f"Error clearing sync checkpoints for store {merchant_id}: {str(e)}")
+        return False
+
+def resume_windows(checkpoints, end_date):
+    """
+    Work out what an interrupted sync still has to fetch.
+    
+    Args:
+        checkpoints: Rows from get_sync_checkpoints
+        end_date: End of the range the new run asks for
+        
+    Returns:
+        List of (start, end) windows: each unfinished window from its cursor,
+        plus the stretch past the old range's end if end_date is later
+    """
+    windows = []
+    range_end = None
+    for checkpoint in checkpoints:
+        window_start = _naive_time(checkpoint['window_start'])
+        window_end = _naive_time(checkpoint['window_end'])
+        range_end = max(range_end, window_end) if range_end else window_end
+        if checkpoint['done']:
+            continue
+        if checkpoint.get('cursor_ms'):
+            window_start = max(window_start, datetime.datetime.fromtimestamp(checkpoint['cursor_ms'] / 1000))
+        windows.append((window_start, window_end))
+    
+    if range_end and end_date > range_end:
+        windows.append((range_end, end_date))
+    return sorted(windows)
+
+def get_store_high_water_mark(store, overlap_minutes=SYNC_OVERLAP_MINUTES):
+    """
+    Get the point an incremental sync should resume from for a store.
+    
+    Args:
+        store: Store record with an optional last_sync_date
+        overlap_minutes: Minutes to re-read before the stored mark
+        
+    Returns:
+        Naive datetime to resume from, or None if the store has never synced
+    """
+    last_sync = store.get('last_sync_date')
+    if not last_sync or (isinstance(last_sync, float) and pd.isna(last_sync)):
+        return None
+    
+    try:
+        last_sync = _naive_time(last_sync)
+    except (ValueError, TypeError, AttributeError):
+        return None
+    
+    return last_sync - datetime.timedelta(minutes=overlap_minutes)
+
+def get_store_access_token(store):
+    """
+    Find the Clover access token for a store.
+    
+    Args:
+        store: Store record with merchant_id and optional access_token
+        
+    Returns:
+        The access token from the store record or secrets, or None
+    """
+    merchant_id = store['merchant_id']
+    access_token = store.get('access_token')
+    
+    # If access token not in store record, check secrets
+    if not access_token:
+        # First check for direct store reference
+        store_key = f"store_{merchant_id}"
+        if hasattr(st, 'secrets') and store_key in st.secrets:
+            access_token = st.secrets[store_key].get('access_token')
+        else:
+            # Check all store configs
+            for key in st.secrets:
+                if key.startswith('store_') or 'store' in key:
+                    store_config = st.secrets[key]
+                    if isinstance(store_config, dict) and store_config.get('merchant_id') == merchant_id:
+                        access_token = store_config.get('access_token')
+                        break
+        
+        # Numbered store format (store_1, store_2, etc)
+        if not access_token:
+            for i in range(1, 20):  # Check up to 20 stores
+                store_key = f'store_{i}'
+                if hasattr(st, 'secrets') and store_key in st.secrets:
+                    if st.secrets[store_key].get('merchant_id') == merchant_id:
+                        access_token = st.secrets[store_key].get('access_token')
+                        break
+    
+    return access_token
+
+def sync_store(store, start_date, end_date, bulk=False, incremental=False, overlap_minutes=SYNC_OVERLAP_MINUTES,
+               replace=False, resume=False, progress=None):
+    """
+    Sync one store from Clover API to Supabase.
+    
+    Args:
+        store: Store record with merchant_id and optional access_token/last_sync_date
+        start_date: Start date for data sync
+        end_date: End date for data sync
+        bulk: Use the bulk orders endpoint with expanded line items
+        incremental: Resume from the store's high-water mark
+        overlap_minutes: Minutes re-read before the high-water mark
+        replace: Clear the store's stored history for the range before reloading it
+        resume: Checkpoint progress in sync_checkpoints and continue an
+            interrupted run from the same start_date instead of starting over
+            (ignored for incremental syncs)
+        progress: Optional callback called with (merchant_id, totals) after
+            each page is written
+        
+    Returns:
+        Dict with success flag and payments/order_items counts
+    """
+    result = {"success": False, "payments": 0, "order_items": 0}
+    
+    merchant_id = store['merchant_id']
+    access_token = get_store_access_token(store)
+    
+    if not access_token:
+        st.warning(f"No access token found for store {store.get('name', merchant_id)}")
+        return result
+    
+    # Resume from the store's high-water mark when syncing incrementally
+    store_start = start_date
+    time_field = "createdTime"
+    if incremental:
+        high_water_mark = get_store_high_water_mark(store, overlap_minutes)
+        if high_water_mark:
+            store_start = high_water_mark
+            time_field = "modifiedTime"
+    
+    # Pick up an interrupted run where its last written page left off
+    checkpoint_job = None
+    windows = None
+    if resume and not incremental:
+        checkpoint_job = sync_checkpoint_job(bulk, time_field, store_start)
+        checkpoints = get_sync_checkpoints(merchant_id, checkpoint_job)
+        if checkpoints:
+            windows = resume_windows(checkpoints, end_date)
+            st.info(f"Resuming the interrupted sync for store {store.get('name', merchant_id)}")
+    
+    # A full reload starts from an empty range so rows deleted in Clover go too.
+    # A resumed reload already cleared it before writing what it has so far
+    if replace and not incremental and windows is None:
+        if not purge_store_history(merchant_id, store_start, end_date):
+            add_sync_log("failed", f"Could not clear history for store {merchant_id}")
+            return result
+    
+    if checkpoint_job:
+        if windows is None:
+            windows = [(store_start, end_date)]
+        if windows:
+            save_sync_checkpoints(merchant_id, checkpoint_job, [
+                {"window_start": window_start, "window_end": window_end, "cursor_ms": None, "done": False}
+                for window_start, window_end in windows
+            ])
+    
+    # The next incremental sync resumes from when this one started, so
+    # records changed while it runs are picked up next time
+    sync_started = datetime.datetime.now()
+    
+    # Stream pages from Clover API into Supabase as they arrive
+    try:
+        synced = stream_clover_data(merchant_id, access_token, store_start, end_date, bulk=bulk,
+                                    time_field=time_field, windows=windows, checkpoint_job=checkpoint_job,
+                                    progress=progress)
+        
+        # Only a range read to the end with every row saved may move the sync date
+        # (or clear the checkpoints), or the next run would skip what was missed
+        failed = synced['payments_saved']['failed'] + synced['items_saved']['failed']
+        if not synced['complete'] or failed:
+            if not synced['complete']:
+                message = f"Sync for store {store.get('name', merchant_id)} stopped before the end of its range"
+            else:
+                message = f"Sync for store {store.get('name', merchant_id)} could not save {failed} rows"
+            message += "; run it again to resume" if checkpoint_job else "; the next sync will read the range again"
+            st.warning(message)
+            add_sync_log("failed", message)
+            return result
+        
+        if checkpoint_job:
+            clear_sync_checkpoints(merchant_id, checkpoint_job)
+        
+        if synced['pages']:
+            # Update sync log
+            add_sync_log("completed", _sync_log_message(synced['payments_saved'], synced['items_saved']))
+            result["payments"] = synced['payments']
+            result["order_items"] = synced['order_items']
+        else:
+            # No data found but not an error
+            st.info(f"No new data found for store {store.get('name', merchant_id)}")
+        
+        result["success"] = True
+        
+        # Update store's last sync date
+        update_store_last_sync(merchant_id, sync_started.isoformat())
+    except Exception as e:
+        st.error(f"Error syncing store {store.get('name', merchant_id)}: {str(e)}")
+        add_sync_log("failed", str(e))
+    
+    return result
+
+def sync_clover_data(store_id=None, start_date=None, end_date=None, bulk=False, incremental=False,
+                     overlap_minutes=SYNC_OVERLAP_MINUTES, max_parallel_stores=SYNC_MAX_STORES, replace=False,
+                     resume=False, progress=None):
     """
     Main function to sync data from Clover API to Supabase.
     
@@ -491,13 +2298,27 @@ def sync_clover_data(store_id=None, start_date=None, end_date=None):
         store_id: Specific store ID to sync, or None for all stores
         start_date: Start date for data sync
         end_date: End date for data sync
+        bulk: Use the bulk orders endpoint with expanded line items
+        incremental: Resume each store from its last sync date (minus the
+            overlap) and fetch only records modified since then; stores that
+            have never synced fall back to start_date
+        overlap_minutes: Minutes re-read before each store's high-water mark
+        max_parallel_stores: Maximum number of stores synced concurrently
+        replace: Clear each store's history in the range before reloading it
+            (ignored for incremental syncs)
+        resume: Checkpoint each store's progress and continue an interrupted
+            run with the same start_date (ignored for incremental syncs)
+        progress: Optional callback called with (merchant_id, totals) after
+            each page a store writes, from the store's sync thread
         
     Returns:
         Dict with success status and message
     """
     if start_date is None:
-        # Default to 30 days ago
-        start_date = datetime.datetime.now() - datetime.timedelta(days=30)
+        # Default to midnight 30 days ago
+        start_date = (datetime.datetime.now() - datetime.timedelta(days=SYNC_DEFAULT_DAYS)).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
     
     if end_date is None:
         end_date = datetime.datetime.now()
@@ -566,64 +2387,28 @@ def sync_clover_data(store_id=None, start_date=None, end_date=None):
         
         results["total_stores"] = len(stores)
         
-        # Sync each store
-        for store in stores:
-            merchant_id = store['merchant_id']
-            access_token = store.get('access_token')
-            
-            # If access token not in store record, check secrets
-            if not access_token:
-                # First check for direct store reference
-                store_key = f"store_{merchant_id}"
-                if hasattr(st, 'secrets') and store_key in st.secrets:
-                    access_token = st.secrets[store_key].get('access_token')
-                else:
-                    # Check all store configs
-                    for key in st.secrets:
-                        if key.startswith('store_') or 'store' in key:
-                            store_config = st.secrets[key]
-                            if isinstance(store_config, dict) and store_config.get('merchant_id') == merchant_id:
-                                access_token = store_config.get('access_token')
-                                break
-                
-                # Numbered store format (store_1, store_2, etc)
-                if not access_token:
-                    for i in range(1, 20):  # Check up to 20 stores
-                        store_key = f'store_{i}'
-                        if hasattr(st, 'secrets') and store_key in st.secrets:
-                            if st.secrets[store_key].get('merchant_id') == merchant_id:
-                                access_token = st.secrets[store_key].get('access_token')
-                                break
-            
-            if not access_token:
-                st.warning(f"No access token found for store {store.get('name', merchant_id)}")
-                results["failed_stores"] += 1
-                continue
-            
-            # Fetch data from Clover API
-            try:
-                clover_data = fetch_clover_data(merchant_id, access_token, start_date, end_date)
+        # Sync several stores at once; the shared limiters in CloverClient keep
+        # the combined load within the global and per-merchant limits
+        with _script_thread_pool(min(max_parallel_stores, len(stores))) as executor:
+            futures = {
+                executor.submit(sync_store, store, start_date, end_date, bulk, incremental, overlap_minutes,
+                                replace, resume, progress): store
+                for store in stores
+            }
+            for future in as_completed(futures):
+                try:
+                    store_result = future.result()
+                except Exception as e:
+                    store = futures[future]
+                    st.error(f"Error syncing store {store.get('name', store['merchant_id'])}: {str(e)}")
+                    store_result = {"success": False}
                 
-                # Process and save data
-                if clover_data['payments'] or clover_data['order_items']:
-                    success = process_and_save_clover_data(merchant_id, clover_data)
-                    
-                    if success:
-                        results["successful_stores"] += 1
-                        results["total_payments"] += len(clover_data['payments'])
-                        results["total_order_items"] += len(clover_data['order_items'])
-                        
-                        # Update store's last sync date
-                        update_store_last_sync(merchant_id)
-                    else:
-                        results["failed_stores"] += 1
-                else:
-                    # No data found but not an error
-                    st.info(f"No new data found for store {store.get('name', merchant_id)}")
+                if store_result["success"]:
                     results["successful_stores"] += 1
-            except Exception as e:
-                st.error(f"Error syncing store {store.get('name', merchant_id)}: {str(e)}")
-                results["failed_stores"] += 1
+                    results["total_payments"] += store_result["payments"]
+                    results["total_order_items"] += store_result["order_items"]
+                else:
+                    results["failed_stores"] += 1
         
         # Overall success if at least one store synced successfully
         success = results["successful_stores"] > 0
@@ -642,4 +2427,166 @@ def sync_clover_data(store_id=None, start_date=None, end_date=None):
     except Exception as e:
         error_message = f"Error syncing Clover data: {str(e)}"
         add_sync_log("failed", error_message)
-        return {"success": False, "message": error_message} 
\ No newline at end of file
+        return {"success": False, "message": error_message} 
+
+def _update_sync_jobs(filters, data):
+    """Update the sync_jobs rows matching PostgREST filters and return them"""
+    client = get_supabase_client()
+    url = f"{client['project_url']}/rest/v1/sync_jobs?{filters}"
+    
+    try:
+        headers = {**client["headers"], "Prefer": "return=representation"}
+        response = supabase_request("PATCH", url, headers=headers, json=data)
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        st.error(f"Error updating sync jobs: {str(e)}")
+        return []
+
+def enqueue_sync_job(store_id, kind, start_date=None, end_date=None):
+    """
+    Queue a sync for the background worker (sync_worker.py).
+    
+    If the store already has the same kind of sync queued or running, that
+    job is returned instead of queueing a duplicate.
+    
+    Args:
+        store_id: Merchant ID to sync, or None for every store
+        kind: 'incremental' or 'full_resync'
+        start_date: Start of a full resync's range
+        end_date: End of a full resync's range, or None for when the job runs
+        
+    Returns:
+        The job record, or None if it could not be queued
+    """
+    if kind not in SYNC_JOB_KINDS:
+        raise ValueError(f"Unknown sync job kind: {kind}")
+    
+    store_filter = f"store_id=eq.{store_id}" if store_id else "store_id=is.null"
+    active = execute_query(f"sync_jobs?{store_filter}&kind=eq.{kind}&status=in.(queued,running)&limit=1")
+    if active:
+        return active[0]
+    
+    result = execute_post("sync_jobs", {
+        "store_id": store_id,
+        "kind": kind,
+        "status": "queued",
+        "start_date": start_date.isoformat() if isinstance(start_date, datetime.datetime) else start_date,
+        "end_date": end_date.isoformat() if isinstance(end_date, datetime.datetime) else end_date,
+        "created_at": datetime.datetime.now().isoformat()
+    })
+    return result[0] if result else None
+
+def get_sync_jobs(store_id=None, limit=5):
+    """Get the most recent sync jobs, newest first. Not cached, so polling sees progress"""
+    store_filter = f"store_id=eq.{store_id}&" if store_id else ""
+    results = execute_query(f"sync_jobs?{store_filter}order=created_at.desc,id.desc&limit={limit}")
+    return results or []
+
+def requeue_stale_sync_jobs(stale_minutes=SYNC_JOB_STALE_MINUTES):
+    """Put running jobs whose worker stopped sending heartbeats back in the queue"""
+    cutoff = (datetime.datetime.now() - datetime.timedelta(minutes=stale_minutes)).isoformat()
+    return _update_sync_jobs(f"status=eq.running&heartbeat_at=lt.{quote(cutoff)}", {
+        "status": "queued",
+        "worker": None,
+        "message": "Requeued after its worker stopped responding"
+    })
+
+def claim_sync_job(worker_id):
+    """
+    Claim the oldest queued job whose stores aren't already being synced.
+    
+    The claim only updates the job while it is still queued, so several
+    workers can poll the same queue without running a job twice.
+    
+    Args:
+        worker_id: Name recorded on the job for the worker running it
+        
+    Returns:
+        The claimed job record, or None if there is nothing to run
+    """
+    requeue_stale_sync_jobs()
+    
+    running = execute_query("sync_jobs?status=eq.running&select=store_id") or []
+    busy = {job['store_id'] for job in running}
+    if None in busy:
+        # An all-stores job is running
+        return None
+    
+    queued = execute_query("sync_jobs?status=eq.queued&order=created_at.asc,id.asc&limit=20") or []
+    for job in queued:
+        if job['store_id'] in busy or (job['store_id'] is None and busy):
+            continue
+        
+        now = datetime.datetime.now().isoformat()
+        claimed = _update_sync_jobs(f"id=eq.{job['id']}&status=eq.queued", {
+            "status": "running",
+            "worker": worker_id,
+            "started_at": now,
+            "heartbeat_at": now,
+            "message": None
+        })
+        if claimed:
+            return claimed[0]
+    return None
+
+def run_sync_job(job):
+    """
+    Run a claimed sync job, reporting its progress on the job record.
+    
+    A reporter thread writes the running page/payment counts every
+    SYNC_JOB_HEARTBEAT_SECONDS, which also tells requeue_stale_sync_jobs the
+    worker is alive. Full resyncs checkpoint as they go, so a requeued one
+    resumes where it stopped.
+    
+    Args:
+        job: Job record from claim_sync_job
+        
+    Returns:
+        The sync_clover_data result
+    """
+    store_counts = {}
+    lock = threading.Lock()
+    finished = threading.Event()
+    
+    def record_progress(merchant_id, totals):
+        with lock:
+            store_counts[merchant_id] = (totals['pages'], totals['payments'], totals['order_items'])
+    
+    def progress_fields():
+        with lock:
+            counts = list(store_counts.values())
+        return {
+            "pages": sum(count[0] for count in counts),
+            "payments": sum(count[1] for count in counts),
+            "order_items": sum(count[2] for count in counts),
+            "heartbeat_at": datetime.datetime.now().isoformat()
+        }
+    
+    def report():
+        while not finished.wait(SYNC_JOB_HEARTBEAT_SECONDS):
+            _update_sync_jobs(f"id=eq.{job['id']}", progress_fields())
+    
+    reporter = threading.Thread(target=report, daemon=True)
+    reporter.start()
+    try:
+        if job['kind'] == "full_resync":
+            start_date = _naive_time(job['start_date']) if job.get('start_date') else None
+            end_date = _naive_time(job['end_date']) if job.get('end_date') else datetime.datetime.now()
+            result = sync_clover_data(job.get('store_id'), start_date, end_date, bulk=True, replace=True,
+                                      resume=True, progress=record_progress)
+        else:
+            result = sync_clover_data(job.get('store_id'), incremental=True, progress=record_progress)
+    except Exception as e:
+        result = {"success": False, "message": f"Error running sync job: {str(e)}"}
+    finally:
+        finished.set()
+        reporter.join()
+    
+    _update_sync_jobs(f"id=eq.{job['id']}", {
+        **progress_fields(),
+        "status": "completed" if result["success"] else "failed",
+        "message": result.get("message"),
+        "finished_at": datetime.datetime.now().isoformat()
+    })
+    return result
@@ -0,0 +1,183 @@
+"""
+Clover API Client
+This module provides a rate-limited HTTP client for the Clover REST API.
+Every sync path goes through it so requests run at the maximum rate Clover
+allows without tripping its limits.
+"""
+
+import os
+import random
+import threading
+import time
+import datetime
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+
+# Clover API settings
+CLOVER_BASE_URL = os.environ.get("CLOVER_BASE_URL", "https://api.clover.com/v3")  # e.g. the Clover sandbox or a mock
+CLOVER_TIMEOUT = 30  # Seconds
+
+# Clover allows 16 requests per second and 5 concurrent requests per token
+CLOVER_TOKEN_RATE = 16
+CLOVER_MERCHANT_RATE = 16
+CLOVER_MAX_CONCURRENT = 5  # Concurrent requests per merchant
+CLOVER_GLOBAL_MAX_CONCURRENT = 16  # Concurrent requests across all merchants
+
+# Retry settings
+CLOVER_MAX_RETRIES = 5
+CLOVER_BACKOFF_BASE = 0.5  # Seconds
+CLOVER_BACKOFF_CAP = 30  # Seconds
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Stop handing out tokens for `seconds`, e.g. after Clover returns 429"""
+        with self.lock:
+            self.tokens = 0
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+# Limiters shared by every client in this process, keyed by merchant and token
+_buckets = {}
+_merchant_slots = {}
+_global_slots = threading.BoundedSemaphore(CLOVER_GLOBAL_MAX_CONCURRENT)
+_registry_lock = threading.Lock()
+_session = None
+
+def get_bucket(kind, key, rate):
+    """Get the shared token bucket for a merchant or access token"""
+    with _registry_lock:
+        if (kind, key) not in _buckets:
+            _buckets[(kind, key)] = TokenBucket(rate)
+        return _buckets[(kind, key)]
+
+def get_merchant_slots(merchant_id):
+    """Get the semaphore bounding concurrent requests for one merchant"""
+    with _registry_lock:
+        if merchant_id not in _merchant_slots:
+            _merchant_slots[merchant_id] = threading.BoundedSemaphore(CLOVER_MAX_CONCURRENT)
+        return _merchant_slots[merchant_id]
+
+def get_session():
+    """Get the shared pooled HTTP session used for Clover requests"""
+    global _session
+    with _registry_lock:
+        if _session is None:
+            adapter = HTTPAdapter(pool_connections=CLOVER_GLOBAL_MAX_CONCURRENT,
+                                  pool_maxsize=CLOVER_GLOBAL_MAX_CONCURRENT)
+            _session = requests.Session()
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+def parse_retry_after(value):
+    """Convert a Retry-After header (seconds or HTTP date) to seconds, or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.datetime.now(retry_at.tzinfo)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(CLOVER_BACKOFF_CAP, CLOVER_BACKOFF_BASE * (2 ** attempt)))
+
+class CloverClient:
+    """
+    Rate-limited client for one merchant's Clover API.
+
+    Each request waits for a token from both the merchant's and the access
+    token's bucket and holds a slot from the merchant and global concurrency
+    budgets. 429 and 5xx responses are retried, honoring Retry-After when
+    Clover sends it and using jittered exponential backoff otherwise.
+    """
+
+    def __init__(self, merchant_id, access_token, max_retries=CLOVER_MAX_RETRIES):
+        self.merchant_id = merchant_id
+        self.access_token = access_token
+        self.max_retries = max_retries
+        self.headers = {
+            'Authorization': f'Bearer {access_token}',
+            'Content-Type': 'application/json'
+        }
+        self.merchant_bucket = get_bucket("merchant", merchant_id, CLOVER_MERCHANT_RATE)
+        self.token_bucket = get_bucket("token", access_token, CLOVER_TOKEN_RATE)
+        self.merchant_slots = get_merchant_slots(merchant_id)
+
+    def url(self, path):
+        """Build the full URL for a path under this merchant"""
+        return f"{CLOVER_BASE_URL}/merchants/{self.merchant_id}/{path.lstrip('/')}"
+
+    def get(self, path, params=None):
+        """
+        GET a resource under this merchant.
+
+        Args:
+            path: Path relative to the merchant, e.g. "payments"
+            params: Optional query parameters
+
+        Returns:
+            Decoded JSON response
+        """
+        url = self.url(path)
+
+        for attempt in range(self.max_retries + 1):
+            self.merchant_bucket.acquire()
+            self.token_bucket.acquire()
+
+            try:
+                with self.merchant_slots, _global_slots:
+                    response = get_session().get(url, headers=self.headers, params=params, timeout=CLOVER_TIMEOUT)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(backoff_delay(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                delay = parse_retry_after(response.headers.get("Retry-After"))
+                if delay is None:
+                    delay = backoff_delay(attempt)
+
+                # Throttle every caller sharing these limits, not just this one
+                if response.status_code == 429:
+                    self.merchant_bucket.pause(delay)
+                    self.token_bucket.pause(delay)
+
+                time.sleep(delay)
+                continue
+
+            response.raise_for_status()
+            return response.json()
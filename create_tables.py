@@ -132,30 +132,36 @@ def create_tables(client):
     );
     """
     
-    # Create payments table
+    # Create payments table, partitioned by month on created_at. Monthly
+    # partitions are added by ensure_sales_partitions during sync; the
+    # default partition catches anything outside them until then
     payments_table = """
     CREATE TABLE IF NOT EXISTS payments (
-        id TEXT PRIMARY KEY,
+        id TEXT NOT NULL,
         merchant_id TEXT NOT NULL,
         order_id TEXT,
         amount INTEGER NOT NULL,
-        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-    );
+        created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at);
+    CREATE TABLE IF NOT EXISTS payments_default PARTITION OF payments DEFAULT;
     """
     
-    # Create order_items table
+    # Create order_items table, partitioned the same way as payments
     order_items_table = """
     CREATE TABLE IF NOT EXISTS order_items (
-        id TEXT PRIMARY KEY,
+        id TEXT NOT NULL,
         merchant_id TEXT NOT NULL,
         order_id TEXT NOT NULL,
         name TEXT,
         price NUMERIC(10,2),
         quantity INTEGER DEFAULT 1,
-        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-    );
+        created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at);
+    CREATE TABLE IF NOT EXISTS order_items_default PARTITION OF order_items DEFAULT;
     """
     
     # Create expenses table
@@ -183,14 +189,454 @@ def create_tables(client):
     );
     """
     
+    # Create daily_sales rollup table, one row per merchant and hour
+    daily_sales_table = """
+    CREATE TABLE IF NOT EXISTS daily_sales (
+        merchant_id TEXT NOT NULL,
+        date DATE NOT NULL,
+        hour SMALLINT NOT NULL,
+        total_amount BIGINT NOT NULL DEFAULT 0,
+        payment_count INTEGER NOT NULL DEFAULT 0,
+        order_count INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        PRIMARY KEY (merchant_id, date, hour)
+    );
+    """
+    
+    # Create sync_checkpoints table, one row per time window of a resumable
+    # sync holding the Clover cursor after the last page written. Windows are
+    # keyed by their end, which stays fixed while the cursor moves the start
+    sync_checkpoints_table = """
+    CREATE TABLE IF NOT EXISTS sync_checkpoints (
+        merchant_id TEXT NOT NULL,
+        job TEXT NOT NULL,
+        window_start TIMESTAMP WITH TIME ZONE NOT NULL,
+        window_end TIMESTAMP WITH TIME ZONE NOT NULL,
+        cursor_ms BIGINT,
+        done BOOLEAN NOT NULL DEFAULT FALSE,
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        PRIMARY KEY (merchant_id, job, window_end)
+    );
+    """
+    
+    # Create sync_jobs table, the queue sync_worker.py runs. Status goes
+    # queued -> running -> completed/failed, and running jobs report their
+    # progress and a heartbeat so stalled ones can be requeued
+    sync_jobs_table = """
+    CREATE TABLE IF NOT EXISTS sync_jobs (
+        id BIGSERIAL PRIMARY KEY,
+        store_id TEXT,
+        kind TEXT NOT NULL,
+        start_date TIMESTAMP WITH TIME ZONE,
+        end_date TIMESTAMP WITH TIME ZONE,
+        status TEXT NOT NULL DEFAULT 'queued',
+        worker TEXT,
+        pages INTEGER NOT NULL DEFAULT 0,
+        payments INTEGER NOT NULL DEFAULT 0,
+        order_items INTEGER NOT NULL DEFAULT 0,
+        message TEXT,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        started_at TIMESTAMP WITH TIME ZONE,
+        heartbeat_at TIMESTAMP WITH TIME ZONE,
+        finished_at TIMESTAMP WITH TIME ZONE
+    );
+    """
+    
     tables = {
         "stores": stores_table,
         "payments": payments_table,
         "order_items": order_items_table,
         "expenses": expenses_table,
-        "sync_log": sync_log_table
+        "sync_log": sync_log_table,
+        "daily_sales": daily_sales_table,
+        "sync_checkpoints": sync_checkpoints_table,
+        "sync_jobs": sync_jobs_table
     }
     
+    # Indexes matching the dashboard and sync access paths: every hot query
+    # filters on merchant/store plus a time range, and paginated reads order
+    # on (created_at, id). BRIN indexes keep time-range scans on the large
+    # append-mostly tables cheap as history grows.
+    indexes = {
+        "payments_merchant_created_idx": """
+        CREATE INDEX IF NOT EXISTS payments_merchant_created_idx
+        ON payments (merchant_id, created_at, id) INCLUDE (amount, order_id);
+        """,
+        "payments_created_brin_idx": """
+        CREATE INDEX IF NOT EXISTS payments_created_brin_idx
+        ON payments USING BRIN (created_at);
+        """,
+        "order_items_merchant_created_idx": """
+        CREATE INDEX IF NOT EXISTS order_items_merchant_created_idx
+        ON order_items (merchant_id, created_at, id);
+        """,
+        "order_items_merchant_order_idx": """
+        CREATE INDEX IF NOT EXISTS order_items_merchant_order_idx
+        ON order_items (merchant_id, order_id);
+        """,
+        "order_items_created_brin_idx": """
+        CREATE INDEX IF NOT EXISTS order_items_created_brin_idx
+        ON order_items USING BRIN (created_at);
+        """,
+        "expenses_store_date_idx": """
+        CREATE INDEX IF NOT EXISTS expenses_store_date_idx
+        ON expenses (store_id, date DESC) INCLUDE (amount, category);
+        """,
+        "sync_log_sync_time_idx": """
+        CREATE INDEX IF NOT EXISTS sync_log_sync_time_idx
+        ON sync_log (sync_time DESC);
+        """,
+        "sync_jobs_status_created_idx": """
+        CREATE INDEX IF NOT EXISTS sync_jobs_status_created_idx
+        ON sync_jobs (status, created_at);
+        """,
+        "sync_jobs_store_created_idx": """
+        CREATE INDEX IF NOT EXISTS sync_jobs_store_created_idx
+        ON sync_jobs (store_id, created_at DESC);
+        """,
+        # Syncs upsert on (id, created_at). Partitioned tables get this from
+        # their primary key; databases created before partitioning have their
+        # id-only primary key widened to match, so an item re-synced with its
+        # real timestamp is stored next to the stale copy instead of failing
+        # (backfill_order_item_times removes the stale copy)
+        "sales_conflict_keys": """
+        DO $$
+        DECLARE
+            v_table TEXT;
+            v_pkey TEXT;
+        BEGIN
+            FOREACH v_table IN ARRAY ARRAY['payments', 'order_items'] LOOP
+                CONTINUE WHEN EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = v_table::REGCLASS);
+                
+                SELECT conname INTO v_pkey
+                FROM pg_constraint
+                WHERE conrelid = v_table::REGCLASS AND contype = 'p' AND array_length(conkey, 1) = 1;
+                
+                IF v_pkey IS NOT NULL THEN
+                    EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', v_table, v_pkey);
+                    EXECUTE format('ALTER TABLE %I ADD PRIMARY KEY (id, created_at)', v_table);
+                END IF;
+                EXECUTE format('DROP INDEX IF EXISTS %I', v_table || '_id_created_key');
+            END LOOP;
+        END;
+        $$;
+        """
+    }
+    
+    # Lets verify_tables.py check index presence through the REST API
+    list_indexes_function = """
+    CREATE OR REPLACE FUNCTION list_table_indexes()
+    RETURNS TABLE (table_name TEXT, index_name TEXT, index_definition TEXT)
+    LANGUAGE sql STABLE AS $$
+        SELECT tablename::TEXT, indexname::TEXT, indexdef::TEXT
+        FROM pg_indexes
+        WHERE schemaname = 'public'
+        ORDER BY tablename, indexname;
+    $$;
+    """
+    
+    # Recompute the daily_sales buckets covering a range of payments. Called
+    # after every sync so the rollup stays current without full rebuilds
+    refresh_daily_sales_function = """
+    CREATE OR REPLACE FUNCTION refresh_daily_sales(
+        p_merchant_id TEXT,
+        p_start TIMESTAMP WITH TIME ZONE,
+        p_end TIMESTAMP WITH TIME ZONE
+    )
+    RETURNS INTEGER
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        v_start TIMESTAMP := date_trunc('hour', p_start AT TIME ZONE 'UTC');
+        v_end TIMESTAMP := date_trunc('hour', p_end AT TIME ZONE 'UTC') + INTERVAL '1 hour';
+        v_rows INTEGER;
+    BEGIN
+        DELETE FROM daily_sales
+        WHERE merchant_id = p_merchant_id
+          AND date BETWEEN v_start::DATE AND v_end::DATE
+          AND date + make_interval(hours => hour) >= v_start
+          AND date + make_interval(hours => hour) < v_end;
+        
+        INSERT INTO daily_sales (merchant_id, date, hour, total_amount, payment_count, order_count, updated_at)
+        SELECT p_merchant_id,
+               (created_at AT TIME ZONE 'UTC')::DATE,
+               EXTRACT(HOUR FROM created_at AT TIME ZONE 'UTC')::SMALLINT,
+               SUM(amount),
+               COUNT(*),
+               COUNT(DISTINCT order_id),
+               NOW()
+        FROM payments
+        WHERE merchant_id = p_merchant_id
+          AND created_at >= v_start AT TIME ZONE 'UTC'
+          AND created_at < v_end AT TIME ZONE 'UTC'
+        GROUP BY 2, 3;
+        
+        GET DIAGNOSTICS v_rows = ROW_COUNT;
+        RETURN v_rows;
+    END;
+    $$;
+    """
+    
+    # Aggregate dashboard KPIs from the daily_sales rollup so the app only
+    # downloads totals and per-bucket series, touching at most 24 rows per day
+    sales_summary_function = """
+    CREATE OR REPLACE FUNCTION get_sales_summary(
+        p_merchant_id TEXT,
+        p_start TIMESTAMP WITH TIME ZONE,
+        p_end TIMESTAMP WITH TIME ZONE,
+        p_bucket TEXT DEFAULT 'day'
+    )
+    RETURNS TABLE (bucket TIMESTAMP, total_amount BIGINT, payment_count BIGINT)
+    LANGUAGE sql STABLE AS $$
+        SELECT date_trunc(p_bucket, date + make_interval(hours => hour)) AS bucket,
+               SUM(total_amount)::BIGINT AS total_amount,
+               SUM(payment_count)::BIGINT AS payment_count
+        FROM daily_sales
+        WHERE merchant_id = p_merchant_id
+          AND date BETWEEN (p_start AT TIME ZONE 'UTC')::DATE AND (p_end AT TIME ZONE 'UTC')::DATE
+          AND date + make_interval(hours => hour) >= date_trunc('hour', p_start AT TIME ZONE 'UTC')
+          AND date + make_interval(hours => hour) <= p_end AT TIME ZONE 'UTC'
+        GROUP BY 1
+        ORDER BY 1;
+    $$;
+    """
+    
+    # Create the monthly partitions of payments and order_items covering a
+    # time range. Rows already sitting in the default partition for a new
+    # month are moved into it so the partition can be attached
+    ensure_partitions_function = """
+    CREATE OR REPLACE FUNCTION ensure_sales_partitions(
+        p_start TIMESTAMP WITH TIME ZONE,
+        p_end TIMESTAMP WITH TIME ZONE
+    )
+    RETURNS INTEGER
+    LANGUAGE plpgsql
+    SECURITY DEFINER
+    SET search_path = public, pg_temp
+    AS $$
+    DECLARE
+        v_table TEXT;
+        v_month TIMESTAMP;
+        v_from TIMESTAMP WITH TIME ZONE;
+        v_to TIMESTAMP WITH TIME ZONE;
+        v_partition TEXT;
+        v_created INTEGER := 0;
+    BEGIN
+        FOREACH v_table IN ARRAY ARRAY['payments', 'order_items'] LOOP
+            -- Databases created before partitioning keep their heap tables
+            CONTINUE WHEN NOT EXISTS (
+                SELECT 1 FROM pg_partitioned_table WHERE partrelid = v_table::REGCLASS
+            );
+            
+            v_month := date_trunc('month', p_start AT TIME ZONE 'UTC');
+            WHILE v_month <= p_end AT TIME ZONE 'UTC' LOOP
+                v_partition := v_table || '_' || to_char(v_month, '"y"YYYY"m"MM');
+                v_from := v_month AT TIME ZONE 'UTC';
+                v_to := (v_month + INTERVAL '1 month') AT TIME ZONE 'UTC';
+                
+                -- Concurrent syncs can ask for the same month: only one
+                -- session checks and creates a partition at a time
+                PERFORM pg_advisory_xact_lock(hashtext(v_partition));
+                
+                IF to_regclass(v_partition) IS NULL THEN
+                    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', v_partition, v_table);
+                    -- Block writes to the default partition until the month is
+                    -- attached, so no new row for it can land there in between
+                    EXECUTE format('LOCK TABLE %I IN SHARE ROW EXCLUSIVE MODE', v_table || '_default');
+                    EXECUTE format(
+                        'WITH moved AS (DELETE FROM %I WHERE created_at >= $1 AND created_at < $2 RETURNING *) '
+                        'INSERT INTO %I SELECT * FROM moved',
+                        v_table || '_default', v_partition
+                    ) USING v_from, v_to;
+                    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                                   v_table, v_partition, v_from, v_to);
+                    v_created := v_created + 1;
+                END IF;
+                
+                v_month := v_month + INTERVAL '1 month';
+            END LOOP;
+        END LOOP;
+        
+        RETURN v_created;
+    END;
+    $$;
+    """
+    
+    # Remove a merchant's payments and order items in a time range before a
+    # full reload. Monthly partitions that fall inside the range and only
+    # hold this merchant's rows are truncated outright; the rest are cleared
+    # with deletes that are pruned to a single partition
+    purge_history_function = """
+    CREATE OR REPLACE FUNCTION purge_merchant_history(
+        p_merchant_id TEXT,
+        p_start TIMESTAMP WITH TIME ZONE,
+        p_end TIMESTAMP WITH TIME ZONE
+    )
+    RETURNS INTEGER
+    LANGUAGE plpgsql
+    SECURITY DEFINER
+    SET search_path = public, pg_temp
+    AS $$
+    DECLARE
+        v_table TEXT;
+        v_partition RECORD;
+        v_other BOOLEAN;
+        v_truncated INTEGER := 0;
+    BEGIN
+        FOREACH v_table IN ARRAY ARRAY['payments', 'order_items'] LOOP
+            FOR v_partition IN
+                SELECT child.relname AS name,
+                       (regexp_match(pg_get_expr(child.relpartbound, child.oid), 'FROM \\(''([^'']+)''\\)'))[1]::TIMESTAMPTZ AS lower_bound,
+                       (regexp_match(pg_get_expr(child.relpartbound, child.oid), 'TO \\(''([^'']+)''\\)'))[1]::TIMESTAMPTZ AS upper_bound
+                FROM pg_inherits
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE pg_inherits.inhparent = v_table::REGCLASS
+            LOOP
+                CONTINUE WHEN v_partition.lower_bound IS NULL
+                    OR v_partition.lower_bound < p_start
+                    OR v_partition.upper_bound > p_end;
+                
+                EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE merchant_id <> $1)', v_partition.name)
+                INTO v_other USING p_merchant_id;
+                
+                IF NOT v_other THEN
+                    EXECUTE format('TRUNCATE %I', v_partition.name);
+                    v_truncated := v_truncated + 1;
+                END IF;
+            END LOOP;
+            
+            EXECUTE format('DELETE FROM %I WHERE merchant_id = $1 AND created_at >= $2 AND created_at <= $3', v_table)
+            USING p_merchant_id, p_start, p_end;
+        END LOOP;
+        
+        DELETE FROM daily_sales
+        WHERE merchant_id = p_merchant_id
+          AND date BETWEEN (p_start AT TIME ZONE 'UTC')::DATE AND (p_end AT TIME ZONE 'UTC')::DATE;
+        
+        RETURN v_truncated;
+    END;
+    $$;
+    """
+    
+    # Find a batch of orders whose items need repairing. Syncs used to stamp
+    # items with the time they were saved, which is always after the sale,
+    # so an order is stale when one of its items is timestamped after the
+    # order's first payment. Both times come from the same sync's clock, so
+    # the check holds whatever timezone the syncing host runs in
+    stale_item_orders_function = """
+    CREATE OR REPLACE FUNCTION stale_order_item_orders(
+        p_merchant_id TEXT,
+        p_after_order_id TEXT DEFAULT NULL,
+        p_limit INTEGER DEFAULT 500
+    )
+    RETURNS TEXT[]
+    LANGUAGE sql STABLE AS $$
+        SELECT ARRAY(
+            SELECT item.order_id
+            FROM order_items item
+            JOIN payments p ON p.merchant_id = item.merchant_id AND p.order_id = item.order_id
+            WHERE item.merchant_id = p_merchant_id
+              AND (p_after_order_id IS NULL OR item.order_id > p_after_order_id)
+            GROUP BY item.order_id
+            HAVING MAX(item.created_at) > MIN(p.created_at)
+            ORDER BY item.order_id
+            LIMIT p_limit
+        );
+    $$;
+    """
+    
+    # Move order items to the created_at a sync gives them now, passed as an
+    # object of item id -> naive timestamp read in the session's timezone
+    # like the timestamps syncs write. Of several copies of an item, the one
+    # already at that time (or else the earliest) is kept and the rest are
+    # removed
+    set_item_times_function = """
+    CREATE OR REPLACE FUNCTION set_order_item_times(
+        p_merchant_id TEXT,
+        p_times JSONB
+    )
+    RETURNS INTEGER
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        v_removed INTEGER;
+        v_moved INTEGER;
+    BEGIN
+        DELETE FROM order_items stale
+        USING jsonb_each_text(p_times) fresh(id, created_at)
+        WHERE stale.merchant_id = p_merchant_id
+          AND stale.id = fresh.id
+          AND stale.created_at <> fresh.created_at::TIMESTAMP WITH TIME ZONE
+          AND EXISTS (
+              SELECT 1 FROM order_items kept
+              WHERE kept.merchant_id = p_merchant_id
+                AND kept.id = stale.id
+                AND (kept.created_at = fresh.created_at::TIMESTAMP WITH TIME ZONE
+                     OR kept.created_at < stale.created_at)
+          );
+        GET DIAGNOSTICS v_removed = ROW_COUNT;
+        
+        UPDATE order_items item
+        SET created_at = fresh.created_at::TIMESTAMP WITH TIME ZONE,
+            updated_at = NOW()
+        FROM jsonb_each_text(p_times) fresh(id, created_at)
+        WHERE item.merchant_id = p_merchant_id
+          AND item.id = fresh.id
+          AND item.created_at <> fresh.created_at::TIMESTAMP WITH TIME ZONE;
+        GET DIAGNOSTICS v_moved = ROW_COUNT;
+        
+        RETURN v_removed + v_moved;
+    END;
+    $$;
+    """
+    
+    # Total expenses for the dashboard metric without downloading every row
+    expense_total_function = """
+    CREATE OR REPLACE FUNCTION get_expense_total(
+        p_store_id TEXT,
+        p_start DATE DEFAULT NULL,
+        p_end DATE DEFAULT NULL
+    )
+    RETURNS NUMERIC
+    LANGUAGE sql STABLE AS $$
+        SELECT COALESCE(SUM(amount), 0)
+        FROM expenses
+        WHERE store_id = p_store_id
+          AND (p_start IS NULL OR date >= p_start)
+          AND (p_end IS NULL OR date <= p_end);
+    $$;
+    """
+    
+    functions = {
+        "ensure_sales_partitions": ensure_partitions_function,
+        "purge_merchant_history": purge_history_function,
+        "stale_order_item_orders": stale_item_orders_function,
+        "set_order_item_times": set_item_times_function,
+        "get_expense_total": expense_total_function,
+        "refresh_daily_sales": refresh_daily_sales_function,
+        "get_sales_summary": sales_summary_function,
+        "list_table_indexes": list_indexes_function
+    }
+    
+    # The app calls these with the anon key, but creating, attaching and
+    # truncating partitions needs the tables' owner, so they run as their
+    # owner (SECURITY DEFINER) and only the API roles may execute them
+    function_grants = {
+        "ensure_sales_partitions": "ensure_sales_partitions(TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE)",
+        "purge_merchant_history": "purge_merchant_history(TEXT, TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE)"
+    }
+    
+    # Build the rollup for payments synced before daily_sales existed
+    daily_sales_backfill = """
+    SELECT refresh_daily_sales(merchant_id, MIN(created_at), MAX(created_at))
+    FROM payments
+    GROUP BY merchant_id;
+    """
+    
+    # Partitions for this month and the next three, so the first syncs after
+    # setup land straight in monthly partitions
+    sales_partitions = """
+    SELECT ensure_sales_partitions(date_trunc('month', NOW()), NOW() + INTERVAL '3 months');
+    """
+    
     results = {}
     
     # Try to create tables
@@ -215,6 +661,50 @@ def create_tables(client):
             except Exception as e:
                 st.error(f"REST API check error: {str(e)}")
     
+    # Create indexes for the dashboard's access paths
+    for index_name, sql in indexes.items():
+        st.write(f"Creating index: {index_name}")
+        success = execute_sql(client, sql)
+        results[index_name] = success
+        if success:
+            st.success(f"✅ Index '{index_name}' created or already exists")
+        else:
+            st.error(f"❌ Failed to create index '{index_name}'")
+    
+    # Create database functions used by the dashboard
+    for function_name, sql in functions.items():
+        st.write(f"Creating function: {function_name}")
+        success = execute_sql(client, sql)
+        results[function_name] = success
+        if success:
+            st.success(f"✅ Function '{function_name}' created or updated")
+        else:
+            st.error(f"❌ Failed to create function '{function_name}'")
+    
+    for function_name, signature in function_grants.items():
+        st.write(f"Granting execute on function: {function_name}")
+        revoked = execute_sql(client, f"REVOKE ALL ON FUNCTION {signature} FROM PUBLIC;")
+        granted = execute_sql(client, f"GRANT EXECUTE ON FUNCTION {signature} TO anon, authenticated, service_role;")
+        results[f"{function_name}_grant"] = revoked and granted
+        if revoked and granted:
+            st.success(f"✅ API roles can execute '{function_name}'")
+        else:
+            st.error(f"❌ Failed to grant execute on '{function_name}'")
+    
+    st.write("Creating partitions for the current and upcoming months")
+    results["sales_partitions"] = execute_sql(client, sales_partitions)
+    if results["sales_partitions"]:
+        st.success("✅ Monthly partitions are in place")
+    else:
+        st.error("❌ Failed to create monthly partitions")
+    
+    st.write("Building daily_sales rollup from existing payments")
+    results["daily_sales_backfill"] = execute_sql(client, daily_sales_backfill)
+    if results["daily_sales_backfill"]:
+        st.success("✅ daily_sales rollup is up to date")
+    else:
+        st.error("❌ Failed to build daily_sales rollup")
+    
     # Check overall result
     if all(results.values()):
         st.success("🎉 All tables created successfully!")
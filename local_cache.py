@@ -0,0 +1,170 @@
+"""
+Local Analytical Cache
+This module keeps a per-merchant copy of payments in local Parquet files so
+dashboard aggregations run on data already downloaded. Each refresh only
+reads rows created since the newest cached payment, which misses rows a
+sync writes behind that point, so the dashboard clears a merchant's cache
+whenever one of its sync jobs finishes. The cache is optional and only
+enabled when pyarrow is installed.
+"""
+
+import os
+import time
+import threading
+from urllib.parse import quote
+import pandas as pd
+
+import cloud_db_utils as db_utils
+
+try:
+    import pyarrow  # noqa: F401 - needed by pandas for Parquet support
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Cache settings
+LOCAL_CACHE_DIR = os.environ.get("CLOVER_CACHE_DIR", os.path.join(".cache", "payments"))
+LOCAL_CACHE_REFRESH_SECONDS = 60  # Minimum time between incremental refreshes
+PAYMENT_COLUMNS = ["id", "order_id", "amount", "created_at"]
+
+# Loaded frames and refresh times, shared by every session in this process
+_frames = {}
+_refreshed_at = {}
+_merchant_locks = {}
+_registry_lock = threading.Lock()
+
+def is_available():
+    """Check whether the local cache can be used"""
+    return PARQUET_AVAILABLE
+
+def _merchant_lock(merchant_id):
+    """Get the lock serializing cache updates for one merchant"""
+    with _registry_lock:
+        if merchant_id not in _merchant_locks:
+            _merchant_locks[merchant_id] = threading.Lock()
+        return _merchant_locks[merchant_id]
+
+def _cache_path(merchant_id):
+    """Get the Parquet file holding a merchant's cached payments"""
+    return os.path.join(LOCAL_CACHE_DIR, f"{merchant_id}.parquet")
+
+def _normalize(payments_df):
+    """Keep the cached columns with created_at as naive UTC and amount in cents"""
+    if payments_df.empty:
+        return pd.DataFrame({
+            "id": pd.Series(dtype=object),
+            "order_id": pd.Series(dtype=object),
+            "amount": pd.Series(dtype="int64"),
+            "created_at": pd.Series(dtype="datetime64[ns]")
+        })
+
+    payments_df = payments_df.reindex(columns=PAYMENT_COLUMNS)
+    payments_df["created_at"] = pd.to_datetime(payments_df["created_at"], utc=True).dt.tz_localize(None)
+    payments_df["amount"] = payments_df["amount"].fillna(0).astype("int64")
+    return payments_df
+
+def _load(merchant_id):
+    """Get a merchant's cached payments, reading the Parquet file on first use"""
+    if merchant_id not in _frames:
+        path = _cache_path(merchant_id)
+        if os.path.exists(path):
+            _frames[merchant_id] = pd.read_parquet(path, columns=PAYMENT_COLUMNS)
+        else:
+            _frames[merchant_id] = _normalize(pd.DataFrame())
+    return _frames[merchant_id]
+
+def _save(merchant_id, payments_df):
+    """Write a merchant's cached payments, replacing the file atomically"""
+    os.makedirs(LOCAL_CACHE_DIR, exist_ok=True)
+    path = _cache_path(merchant_id)
+    temp_path = f"{path}.tmp"
+    payments_df.to_parquet(temp_path, index=False)
+    os.replace(temp_path, path)
+
+def refresh(merchant_id, force=False):
+    """
+    Bring a merchant's cached payments up to date with Supabase.
+
+    Only rows created at or after the newest cached payment are read, so a
+    refresh costs one short query once the history is cached.
+
+    Args:
+        merchant_id: The Clover merchant ID
+        force: Refresh even if the last refresh was under LOCAL_CACHE_REFRESH_SECONDS ago
+
+    Returns:
+        DataFrame with the merchant's cached payments
+
+    Raises:
+        RuntimeError: If Supabase can't be read; the cache is left as it was
+    """
+    with _merchant_lock(merchant_id):
+        cached = _load(merchant_id)
+        if not force and time.monotonic() - _refreshed_at.get(merchant_id, float("-inf")) < LOCAL_CACHE_REFRESH_SECONDS:
+            return cached
+
+        query = f"payments?merchant_id=eq.{merchant_id}&select={','.join(PAYMENT_COLUMNS)}"
+        if not cached.empty:
+            query += f"&created_at=gte.{quote(cached['created_at'].max().isoformat())}"
+
+        new_rows = _normalize(db_utils.read_query_frame(query))
+        if not new_rows.empty:
+            # The newest cached timestamp is read again, so drop the repeats
+            cached = pd.concat([cached, new_rows], ignore_index=True)
+            cached = cached.drop_duplicates(subset=["id", "created_at"], keep="last")
+            cached = cached.sort_values(["created_at", "id"], ignore_index=True)
+            _save(merchant_id, cached)
+            _frames[merchant_id] = cached
+
+        _refreshed_at[merchant_id] = time.monotonic()
+        return cached
+
+def clear(merchant_id):
+    """Drop a merchant's cached payments, e.g. after a full resync"""
+    with _merchant_lock(merchant_id):
+        _frames.pop(merchant_id, None)
+        _refreshed_at.pop(merchant_id, None)
+        path = _cache_path(merchant_id)
+        if os.path.exists(path):
+            os.remove(path)
+
+def get_payments(merchant_id, start_date=None, end_date=None):
+    """
+    Get a merchant's payments from the local cache with optional date range.
+
+    Args:
+        merchant_id: The Clover merchant ID
+        start_date: Start of the range
+        end_date: End of the range
+
+    Returns:
+        DataFrame of payments with id, order_id, amount and created_at
+    """
+    payments_df = refresh(merchant_id)
+    if start_date is not None and end_date is not None:
+        created_at = payments_df["created_at"]
+        payments_df = payments_df[(created_at >= pd.Timestamp(start_date)) & (created_at <= pd.Timestamp(end_date))]
+    return payments_df
+
+def get_sales_summary(merchant_id, start_date, end_date, bucket="day"):
+    """
+    Get sales totals and a per-bucket series for a merchant from the local cache.
+
+    Returns the same shape as cloud_db_utils.get_sales_summary.
+
+    Args:
+        merchant_id: The Clover merchant ID
+        start_date: Start of the range
+        end_date: End of the range
+        bucket: Time bucket for the series - 'hour', 'day' or 'month'
+
+    Returns:
+        Dict with total_sales (dollars), order_count and a series DataFrame
+        with bucket, total_sales and order_count columns
+    """
+    series = db_utils._summarize_payments(get_payments(merchant_id, start_date, end_date), bucket)
+    return {
+        "total_sales": float(series["total_sales"].sum()),
+        "order_count": int(series["order_count"].sum()),
+        "series": series
+    }
@@ -0,0 +1,178 @@
+"""
+Raw Clover Archive
+This module keeps every page of raw Clover records a sync fetches as
+gzip-compressed NDJSON on local disk, partitioned by merchant and day:
+
+    clover_archive/<merchant_id>/<YYYY-MM-DD>/payments.ndjson.gz
+    clover_archive/<merchant_id>/<YYYY-MM-DD>/order_items.ndjson.gz
+
+Each page is appended as its own gzip member, so writes never rewrite a
+file. Reading memory-maps each partition and streams it line by line, which
+lets cloud_db_utils.reprocess_clover_archive rebuild the payments and
+order_items tables after a transform change without calling Clover.
+Set CLOVER_ARCHIVE_DIR to move the archive, or to an empty string to turn
+it off.
+
+    python raw_archive.py MERCHANT_ID [--start 2024-01-01] [--end 2024-12-31]
+"""
+
+import os
+import gzip
+import shutil
+import argparse
+import json
+import mmap
+import zlib
+import datetime
+import threading
+from collections import defaultdict
+
+# Archive settings
+ARCHIVE_DIR = os.environ.get("CLOVER_ARCHIVE_DIR", "clover_archive")
+ARCHIVE_KINDS = ("payments", "order_items")
+ARCHIVE_COMPRESS_LEVEL = 1  # Fast compression keeps archiving off the sync's critical path
+ARCHIVE_UNDATED = "undated"  # Partition for records Clover gave no timestamp
+
+_merchant_locks = {}
+_registry_lock = threading.Lock()
+
+def is_enabled():
+    """Check whether fetched pages should be archived"""
+    return bool(ARCHIVE_DIR)
+
+def _merchant_lock(merchant_id):
+    """Get the lock serializing archive writes for one merchant"""
+    with _registry_lock:
+        if merchant_id not in _merchant_locks:
+            _merchant_locks[merchant_id] = threading.Lock()
+        return _merchant_locks[merchant_id]
+
+def _partition_path(merchant_id, day, kind):
+    """Get the file holding one kind of record for a merchant's day"""
+    return os.path.join(ARCHIVE_DIR, merchant_id, day, f"{kind}.ndjson.gz")
+
+def _record_day(record, kind):
+    """
+    Get the day partition for a raw record, in local time like the created_at
+    the transform gives it. Line items fall back to their order's time.
+    """
+    created_time = record.get('createdTime')
+    if not created_time and kind == "order_items":
+        created_time = record.get('orderCreatedTime')
+    if not created_time:
+        return ARCHIVE_UNDATED
+    return datetime.datetime.fromtimestamp(created_time / 1000).date().isoformat()
+
+def archive_page(merchant_id, page):
+    """
+    Append a page of raw Clover records to the merchant's day partitions.
+
+    Args:
+        merchant_id: The Clover merchant ID
+        page: Dict with raw 'payments' and 'order_items' lists, as yielded
+            by cloud_db_utils.iter_clover_pages
+
+    Returns:
+        Number of records archived
+    """
+    partitions = defaultdict(list)
+    for kind in ARCHIVE_KINDS:
+        for record in page.get(kind) or []:
+            partitions[(_record_day(record, kind), kind)].append(json.dumps(record, separators=(",", ":")))
+
+    with _merchant_lock(merchant_id):
+        for (day, kind), lines in partitions.items():
+            path = _partition_path(merchant_id, day, kind)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with gzip.open(path, "ab", compresslevel=ARCHIVE_COMPRESS_LEVEL) as f:
+                f.write(("\n".join(lines) + "\n").encode())
+
+    return sum(len(lines) for lines in partitions.values())
+
+def archived_days(merchant_id, start_date=None, end_date=None):
+    """
+    List the days archived for a merchant, oldest first.
+
+    Args:
+        merchant_id: The Clover merchant ID
+        start_date: Optional first day (date or datetime) to include
+        end_date: Optional last day (date or datetime) to include
+
+    Returns:
+        List of YYYY-MM-DD partition names, with the undated partition last
+        when no range is given
+    """
+    merchant_dir = os.path.join(ARCHIVE_DIR, merchant_id)
+    if not os.path.isdir(merchant_dir):
+        return []
+
+    first = start_date.strftime("%Y-%m-%d") if start_date else None
+    last = end_date.strftime("%Y-%m-%d") if end_date else None
+    days = []
+    for day in sorted(os.listdir(merchant_dir)):
+        if day == ARCHIVE_UNDATED:
+            continue
+        if (first and day < first) or (last and day > last):
+            continue
+        days.append(day)
+
+    if not start_date and not end_date and os.path.isdir(os.path.join(merchant_dir, ARCHIVE_UNDATED)):
+        days.append(ARCHIVE_UNDATED)
+    return days
+
+def _read_partition(path):
+    """
+    Stream the raw records of one partition file through a memory map.
+
+    A sync killed mid-write can leave a cut-off gzip member at the end of
+    the file; reading stops there, keeping every complete record before it.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        with gzip.GzipFile(fileobj=mapped) as archive:
+            try:
+                for line in archive:
+                    if line.strip():
+                        yield json.loads(line)
+            except (EOFError, zlib.error, gzip.BadGzipFile, json.JSONDecodeError):
+                return
+
+def iter_archived_records(merchant_id, kind, day):
+    """
+    Yield one day's raw records of a kind, each id once.
+
+    The same record is archived again whenever a sync refetches it, so only
+    its most recently archived copy is kept.
+    """
+    latest = {}
+    for record in _read_partition(_partition_path(merchant_id, day, kind)):
+        latest[record.get('id')] = record
+    yield from latest.values()
+
+def clear(merchant_id):
+    """Delete a merchant's archive"""
+    with _merchant_lock(merchant_id):
+        shutil.rmtree(os.path.join(ARCHIVE_DIR, merchant_id), ignore_errors=True)
+
+def main():
+    # cloud_db_utils archives pages through this module, so import it only when run as a script
+    import streamlit.logger
+    import cloud_db_utils as db_utils
+
+    parser = argparse.ArgumentParser(description="Rebuild payments and order_items from the raw Clover archive")
+    parser.add_argument("merchant_ids", nargs="+", help="Merchants to reprocess")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, help="First day to reprocess (YYYY-MM-DD)")
+    parser.add_argument("--end", type=datetime.date.fromisoformat, help="Last day to reprocess (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    # Streamlit calls outside `streamlit run` only log noise
+    streamlit.logger.set_log_level("error")
+
+    for merchant_id in args.merchant_ids:
+        result = db_utils.reprocess_clover_archive(merchant_id, args.start, args.end)
+        print(f"{merchant_id}: {result['message']}", flush=True)
+
+if __name__ == "__main__":
+    main()
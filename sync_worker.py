@@ -0,0 +1,88 @@
+"""
+Background Sync Worker
+This script runs the sync jobs queued from the dashboard in the sync_jobs
+table, so a sync never ties up a Streamlit session. Start it next to the app
+with the same .streamlit/secrets.toml:
+
+    python sync_worker.py
+    python sync_worker.py --concurrency 2 --poll-seconds 10
+    python sync_worker.py --once
+"""
+
+import argparse
+import os
+import socket
+import threading
+import time
+
+import cloud_db_utils as db_utils
+
+WORKER_POLL_SECONDS = 5  # Time between queue checks when there is nothing to run
+
+def log(message):
+    """Print a timestamped line"""
+    print(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {message}", flush=True)
+
+def run_next_job(worker_id):
+    """
+    Claim and run the next queued job.
+
+    Returns:
+        True if a job was run, False if the queue had nothing to run
+    """
+    job = db_utils.claim_sync_job(worker_id)
+    if not job:
+        return False
+
+    store = job.get('store_id') or "all stores"
+    log(f"{worker_id} started job {job['id']} ({job['kind']} sync of {store})")
+    result = db_utils.run_sync_job(job)
+    status = "completed" if result["success"] else "failed"
+    log(f"{worker_id} {status} job {job['id']}: {result.get('message', '')}")
+    return True
+
+def work(worker_id, poll_seconds, stop):
+    """Run jobs until stop is set, polling the queue while it is empty"""
+    while not stop.is_set():
+        try:
+            if run_next_job(worker_id):
+                continue
+        except Exception as e:
+            log(f"{worker_id} error: {str(e)}")
+        stop.wait(poll_seconds)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued Clover sync jobs")
+    parser.add_argument("--concurrency", type=int, default=1, help="Jobs run at the same time")
+    parser.add_argument("--poll-seconds", type=float, default=WORKER_POLL_SECONDS,
+                        help="Seconds between queue checks while idle")
+    parser.add_argument("--once", action="store_true", help="Run the queued jobs, then exit")
+    args = parser.parse_args()
+
+    worker_name = f"{socket.gethostname()}:{os.getpid()}"
+
+    if args.once:
+        while run_next_job(worker_name):
+            pass
+        return
+
+    log(f"Sync worker {worker_name} waiting for jobs ({args.concurrency} at a time)")
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=work, args=(f"{worker_name}/{i + 1}", args.poll_seconds, stop), daemon=True)
+        for i in range(max(1, args.concurrency))
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        # Running jobs checkpoint as they go, so an interrupted one resumes
+        # once requeue_stale_sync_jobs puts it back in the queue
+        log("Stopping sync worker")
+        stop.set()
+
+if __name__ == "__main__":
+    main()
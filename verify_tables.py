@@ -87,15 +87,54 @@ def verify_table(client, table_name):
         st.error(f"❌ Error verifying table '{table_name}': {str(e)}")
         return False
 
+def verify_indexes(client, table_name):
+    """Verify that the indexes create_tables.py provisions for a table exist"""
+    expected = required_indexes.get(table_name, [])
+    if not expected:
+        return True
+    
+    try:
+        url = f"{client['project_url']}/rest/v1/rpc/list_table_indexes"
+        response = requests.post(url, headers=client["headers"], json={}, timeout=10)
+        
+        if response.status_code != 200:
+            st.warning(f"⚠️ Could not list indexes (Status code: {response.status_code}). Run create_tables.py to install list_table_indexes.")
+            return False
+        
+        present = {row["index_name"] for row in response.json() if row["table_name"] == table_name}
+        missing = [index for index in expected if index not in present]
+        
+        if missing:
+            st.error(f"❌ Missing indexes on '{table_name}': {', '.join(missing)}")
+            return False
+        
+        st.success(f"✅ All {len(expected)} indexes on '{table_name}' exist")
+        return True
+    except Exception as e:
+        st.error(f"❌ Error verifying indexes on '{table_name}': {str(e)}")
+        return False
+
 # The main tables to check
 required_tables = [
     "stores", 
     "payments", 
     "order_items", 
     "expenses", 
-    "sync_log"
+    "sync_log",
+    "daily_sales",
+    "sync_checkpoints",
+    "sync_jobs"
 ]
 
+# Indexes create_tables.py provisions for the dashboard's access paths
+required_indexes = {
+    "payments": ["payments_merchant_created_idx", "payments_created_brin_idx"],
+    "order_items": ["order_items_merchant_created_idx", "order_items_merchant_order_idx", "order_items_created_brin_idx"],
+    "expenses": ["expenses_store_date_idx"],
+    "sync_log": ["sync_log_sync_time_idx"],
+    "sync_jobs": ["sync_jobs_status_created_idx", "sync_jobs_store_created_idx"]
+}
+
 # Main execution
 supabase_client = get_supabase_client()
 
@@ -117,6 +156,8 @@ if st.button("Verify Tables"):
             for table in required_tables:
                 st.subheader(f"Checking table: {table}")
                 results[table] = verify_table(supabase_client, table)
+                if results[table]:
+                    results[table] = verify_indexes(supabase_client, table)
                 st.divider()
             
             # Final summary
@@ -128,4 +169,5 @@ if st.button("Verify Tables"):
         else:
             # Check just the selected table
             st.subheader(f"Checking table: {selected_table}")
-            verify_table(supabase_client, selected_table) 
\ No newline at end of file
+            if verify_table(supabase_client, selected_table):
+                verify_indexes(supabase_client, selected_table) 
\ No newline at end of file